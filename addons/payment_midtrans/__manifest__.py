@@ -1,6 +1,6 @@
 {
     "name": "Midtrans Payment Provider",
-    "version": "17.0.1.0.0",
+    "version": "17.0.1.3.0",
     "category": "Accounting/Payment",
     "summary": "Midtrans Payment Provider Integration for Odoo 17",
     "description": """
@@ -22,6 +22,12 @@
         'views/payment_provider_views.xml',       
         'views/payment_midtrans_templates.xml',   
         'data/payment_provider_data.xml',      
+        'data/ir_cron_data.xml',
+        'views/pos_payment_method_views.xml',
+        'views/payment_midtrans_settlement_views.xml',
+        'views/payment_midtrans_stats_views.xml',
+        'views/payment_midtrans_audit_views.xml',
+        'wizards/payment_midtrans_bulk_result_views.xml',
     ],
     'assets': {
         'web.assets_frontend': [
@@ -30,8 +36,8 @@
         'web.assets_backend': [
             'payment_midtrans/static/src/css/payment_dashboard.css',
         ],
-        'point_of_sale._pos_assets': [
-            'payment_midtrans/static/src/js/payment_form.js',
+        'point_of_sale._assets_pos': [
+            'payment_midtrans/static/src/pos/**/*',
         ],
     },
     "installable": True,
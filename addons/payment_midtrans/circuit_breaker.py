@@ -0,0 +1,175 @@
+import logging
+import threading
+import time
+from collections import deque
+
+import requests
+
+from odoo import _, sql_db
+
+from odoo.addons.payment_midtrans import const
+
+_logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Request ditolak karena circuit breaker Midtrans sedang terbuka"""
+
+
+class CircuitBreaker:
+    """Circuit breaker untuk outbound call ke Midtrans.
+
+    Setiap worker process mencatat hasil call di sliding window lokal. Begitu rasio
+    error atau call lambat melewati ambang batas, circuit dibuka dengan menulis
+    `midtrans_circuit_open_until` pada provider lewat cursor terpisah, sehingga semua
+    worker (dan semua host) ikut fail fast. Setelah masa open habis, tepat satu
+    worker meng-claim probe (half-open); jika probe sukses circuit ditutup, jika
+    gagal circuit dibuka lagi.
+
+    Tidak memakai ORM sehingga aman dipanggil dari thread lain.
+    """
+
+    def __init__(self, dbname, provider_id):
+        self.dbname = dbname
+        self.provider_id = provider_id
+        self._lock = threading.Lock()
+        self._calls = deque()  # (timestamp, failed, slow)
+        self._open_until = None  # epoch detik, dari shared state
+        self._synced_at = 0.0
+        self._probing = False
+
+    def before_call(self):
+        """Cek apakah call boleh dilakukan.
+
+        :return: True jika call ini adalah probe half-open
+        :raise CircuitOpenError: jika circuit terbuka
+        """
+        now = time.time()
+        if now - self._synced_at > const.BREAKER_SYNC_INTERVAL:
+            self._sync()
+        open_until = self._open_until
+        if open_until is None:
+            return False
+        if now < open_until or not self._claim_probe():
+            # Pesan ini ditampilkan ke customer; bahasa diambil dari request yang sedang berjalan
+            raise CircuitOpenError(
+                _("Midtrans is temporarily unavailable. Please try again in a few moments.")
+            )
+        return True
+
+    def release_probe(self):
+        """Lepas claim probe lokal tanpa mengubah state circuit (probe berakhir tanpa hasil)"""
+        with self._lock:
+            self._probing = False
+
+    def after_call(self, elapsed, failed, probe=False):
+        """Catat hasil call dan buka/tutup circuit jika perlu"""
+        if probe:
+            self.release_probe()
+            if failed:
+                self._open()
+            else:
+                self._close()
+            return
+
+        now = time.time()
+        with self._lock:
+            self._calls.append((now, failed, elapsed >= const.BREAKER_SLOW_CALL))
+            while self._calls and self._calls[0][0] < now - const.BREAKER_WINDOW:
+                self._calls.popleft()
+            total = len(self._calls)
+            if total < const.BREAKER_MIN_CALLS:
+                return
+            failures = sum(1 for _ts, call_failed, _slow in self._calls if call_failed)
+            slow = sum(1 for _ts, _failed, call_slow in self._calls if call_slow)
+            should_open = (
+                failures / total >= const.BREAKER_ERROR_RATE
+                or slow / total >= const.BREAKER_SLOW_RATE
+            )
+            if should_open:
+                self._calls.clear()
+        if should_open:
+            _logger.warning(
+                "Midtrans circuit breaker opened for provider %s (%s/%s failed, %s/%s slow)",
+                self.provider_id, failures, total, slow, total
+            )
+            self._open()
+
+    def _cursor(self):
+        return sql_db.db_connect(self.dbname).cursor()
+
+    def _sync(self):
+        try:
+            with self._cursor() as cr:
+                cr.execute("""
+                    SELECT EXTRACT(EPOCH FROM midtrans_circuit_open_until)
+                      FROM payment_provider
+                     WHERE id = %s
+                """, [self.provider_id])
+                row = cr.fetchone()
+        except Exception:  # noqa: BLE001 - breaker tidak boleh menggagalkan request
+            _logger.exception("Unable to read Midtrans circuit breaker state")
+            return
+        self._open_until = float(row[0]) if row and row[0] is not None else None
+        self._synced_at = time.time()
+
+    def _claim_probe(self):
+        """Claim probe half-open secara atomik; hanya satu worker yang berhasil"""
+        with self._lock:
+            if self._probing:
+                return False
+            self._probing = True
+        claimed = False
+        try:
+            with self._cursor() as cr:
+                cr.execute("""
+                    UPDATE payment_provider
+                       SET midtrans_circuit_probe_at = NOW() AT TIME ZONE 'UTC'
+                     WHERE id = %s
+                       AND midtrans_circuit_open_until <= NOW() AT TIME ZONE 'UTC'
+                       AND (midtrans_circuit_probe_at IS NULL
+                            OR midtrans_circuit_probe_at < NOW() AT TIME ZONE 'UTC' - %s * INTERVAL '1 second')
+                 RETURNING id
+                """, [self.provider_id, const.BREAKER_PROBE_TIMEOUT])
+                claimed = bool(cr.fetchone())
+        except Exception:  # noqa: BLE001 - anggap probe tidak didapat (CircuitOpenError)
+            _logger.exception("Unable to claim Midtrans circuit breaker probe")
+        finally:
+            if not claimed:
+                with self._lock:
+                    self._probing = False
+        if not claimed:
+            # Worker lain sedang probe, atau circuit sudah ditutup: baca ulang shared state
+            self._synced_at = 0.0
+        return claimed
+
+    def _open(self):
+        try:
+            with self._cursor() as cr:
+                cr.execute("""
+                    UPDATE payment_provider
+                       SET midtrans_circuit_open_until = NOW() AT TIME ZONE 'UTC' + %s * INTERVAL '1 second',
+                           midtrans_circuit_probe_at = NULL
+                     WHERE id = %s
+                """, [const.BREAKER_OPEN_DURATION, self.provider_id])
+        except Exception:  # noqa: BLE001 - breaker tidak boleh menggagalkan request
+            # Tetap buka circuit secara lokal agar worker ini fail fast
+            _logger.exception("Unable to write Midtrans circuit breaker state")
+        self._open_until = time.time() + const.BREAKER_OPEN_DURATION
+        self._synced_at = time.time()
+
+    def _close(self):
+        try:
+            with self._cursor() as cr:
+                cr.execute("""
+                    UPDATE payment_provider
+                       SET midtrans_circuit_open_until = NULL,
+                           midtrans_circuit_probe_at = NULL
+                     WHERE id = %s
+                """, [self.provider_id])
+        except Exception:  # noqa: BLE001 - breaker tidak boleh menggagalkan request
+            # Worker lain akan mem-probe ulang setelah masa open habis
+            _logger.exception("Unable to write Midtrans circuit breaker state")
+        _logger.info("Midtrans circuit breaker closed for provider %s", self.provider_id)
+        self._open_until = None
+        self._synced_at = time.time()
@@ -0,0 +1,153 @@
+# Konstanta untuk integrasi Midtrans
+
+# Timeout (detik) untuk koneksi HTTP ke Midtrans: (connect, read)
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+
+# Adaptive read timeout: p99 latency x faktor, dibatasi [MIN_READ_TIMEOUT, READ_TIMEOUT]
+ADAPTIVE_TIMEOUT_FACTOR = 3
+ADAPTIVE_TIMEOUT_MIN_SAMPLES = 20
+ADAPTIVE_TIMEOUT_SAMPLE_SIZE = 200
+MIN_READ_TIMEOUT = 2
+
+# Ukuran connection pool per client (per provider, per worker process)
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 16
+
+# Inbox notifikasi asynchronous. Nilai default dapat di-override lewat
+# System Parameters (ir.config_parameter) dengan key di bawah.
+INBOX_BATCH_SIZE_PARAM = 'payment_midtrans.inbox_batch_size'
+INBOX_WORKERS_PARAM = 'payment_midtrans.inbox_workers'
+INBOX_RETRY_BACKOFF_PARAM = 'payment_midtrans.inbox_retry_backoff'
+INBOX_MAX_ATTEMPTS_PARAM = 'payment_midtrans.inbox_max_attempts'
+
+INBOX_BATCH_SIZE = 100
+INBOX_WORKERS = 1
+INBOX_RETRY_BACKOFF = 60  # detik, dikali 2 setiap percobaan ulang
+INBOX_MAX_ATTEMPTS = 5
+INBOX_DONE_RETENTION_DAYS = 7
+
+# Urutan state transaksi; notifikasi hanya diterapkan jika state target lebih maju
+STATE_RANK = {
+    'draft': 0,
+    'pending': 1,
+    'authorized': 2,
+    # Di bawah done agar settlement/capture yang datang setelah error (mis. status tak
+    # dikenal seperti `authorize`) tetap diproses, sama seperti core `_set_done`
+    'error': 3,
+    'done': 4,
+    'cancel': 4,
+}
+
+# Masa berlaku Snap token dari Midtrans (24 jam), dengan margin sebelum dianggap expired
+SNAP_TOKEN_LIFETIME_HOURS = 24
+SNAP_TOKEN_EXPIRY_MARGIN_MINUTES = 5
+
+# Batas waktu pembayaran yang dikirim ke Snap (`expiry`); transaksi yang melewatinya
+# dibatalkan lokal oleh cron sweeper setelah masa tenggang
+SNAP_PAYMENT_EXPIRY_MINUTES = 24 * 60
+EXPIRY_GRACE_MINUTES = 30
+EXPIRY_CHECK_BORDERLINE_PARAM = 'payment_midtrans.expiry_check_borderline'
+
+# Rekonsiliasi status transaksi pending/authorized dengan Midtrans
+RECONCILE_PAGE_SIZE_PARAM = 'payment_midtrans.reconcile_page_size'
+RECONCILE_WORKERS_PARAM = 'payment_midtrans.reconcile_workers'
+RECONCILE_RATE_LIMIT_PARAM = 'payment_midtrans.reconcile_rate_limit'
+RECONCILE_MIN_AGE_PARAM = 'payment_midtrans.reconcile_min_age'
+
+RECONCILE_PAGE_SIZE = 200
+RECONCILE_WORKERS = 8
+RECONCILE_RATE_LIMIT = 20  # request per detik
+RECONCILE_MIN_AGE = 10  # menit sejak transaksi dibuat
+
+# Token untuk route /payment/midtrans/metrics; route nonaktif jika parameter kosong
+METRICS_TOKEN_PARAM = 'payment_midtrans.metrics_token'
+# Interval (detik) setiap worker menambahkan delta metric-nya ke tabel bersama
+METRICS_FLUSH_INTERVAL = 15
+
+# Override base URL API Midtrans (mis. 'http://localhost:8899/v2' untuk simulator lokal)
+API_URL_OVERRIDE_PARAM = 'payment_midtrans.api_url_override'
+
+# Panjang maksimum nama item di payload Snap
+ITEM_NAME_MAX_LENGTH = 50
+
+# Namespace (key pertama) advisory lock PostgreSQL untuk single-flight per order id
+ADVISORY_LOCK_NAMESPACE = 0x4D54  # 'MT'
+
+# Mapping status Midtrans -> state transaksi Odoo.
+# Key: (transaction_status, fraud_status); fraud_status None berarti berlaku untuk semua.
+# Reference: https://docs.midtrans.com/en/after-payment/http-notification
+STATUS_MAPPING = {
+    ('capture', 'accept'): 'done',        # Pembayaran kartu berhasil di-capture
+    ('capture', 'challenge'): 'pending',  # Perlu review fraud
+    ('settlement', None): 'done',         # Pembayaran sukses (non kartu kredit)
+    ('pending', None): 'pending',         # Menunggu customer membayar
+    ('cancel', None): 'cancel',
+    ('deny', None): 'cancel',
+    ('expire', None): 'cancel',
+    ('refund', None): None,               # Refund dicatat sebagai child transaction
+    ('partial_refund', None): None,
+}
+
+# Method `payment.transaction` untuk setiap state target
+STATE_SETTERS = {
+    'pending': '_set_pending',
+    'done': '_set_done',
+    'cancel': '_set_canceled',
+    'error': '_set_error',
+}
+
+# Circuit breaker outbound call Midtrans
+BREAKER_WINDOW = 60  # detik, sliding window per worker process
+BREAKER_MIN_CALLS = 10  # jumlah call minimum di window sebelum circuit bisa dibuka
+BREAKER_ERROR_RATE = 0.5
+BREAKER_SLOW_CALL = 5  # detik; call lebih lama dari ini dihitung lambat
+BREAKER_SLOW_RATE = 0.5
+BREAKER_OPEN_DURATION = 30  # detik sebelum half-open probe
+BREAKER_PROBE_TIMEOUT = 15  # detik sebelum probe yang macet boleh di-claim ulang
+BREAKER_SYNC_INTERVAL = 2  # detik antar pembacaan shared state dari database
+
+# QRIS untuk terminal POS (Core API /charge)
+POS_ORDER_PREFIX = 'POS-QRIS-'
+POS_QRIS_EXPIRY_MINUTES = 15
+POS_BUS_NOTIFICATION = 'MIDTRANS_QRIS_STATUS'
+
+# Import laporan settlement; file diproses per batch dan di-commit per batch
+SETTLEMENT_BATCH_SIZE_PARAM = 'payment_midtrans.settlement_batch_size'
+SETTLEMENT_BATCH_SIZE = 5000
+
+# Nama kolom di laporan settlement Midtrans -> key internal
+SETTLEMENT_COLUMN_ALIASES = {
+    'order_id': 'order_id',
+    'transaction_id': 'transaction_id',
+    'amount': 'gross_amount',
+    'gross_amount': 'gross_amount',
+    'fee': 'fee',
+    'mdr': 'fee',
+    'fee_amount': 'fee',
+    'net_amount': 'net_amount',
+    'settlement_amount': 'net_amount',
+    'status': 'transaction_status',
+    'transaction_status': 'transaction_status',
+}
+
+# Status di laporan settlement -> state transaksi yang diharapkan
+SETTLEMENT_STATUS_STATES = {
+    'settlement': 'done',
+    'capture': 'done',
+}
+# Baris refund bukan settlement baru: mengurangi net payout dari transaksi yang sudah done
+SETTLEMENT_REFUND_STATUSES = ('refund', 'partial_refund')
+
+# Aksi massal dari list transaksi: aksi -> state transaksi yang boleh diproses
+BULK_ACTION_STATES = {
+    'cancel': ('draft', 'pending', 'authorized'),
+    'expire': ('draft', 'pending'),
+    'refund': ('done',),
+}
+
+# Log audit payload Midtrans (JSON terkompresi zlib)
+AUDIT_RETENTION_DAYS_PARAM = 'payment_midtrans.audit_retention_days'
+AUDIT_RETENTION_DAYS = 180
+AUDIT_PRUNE_BATCH_SIZE = 10000
+AUDIT_COMPRESSION_LEVEL = 6
@@ -1,14 +1,15 @@
+import hmac
 import logging
-import pprint
-import requests
-import base64
-import hashlib
+
+import psycopg2
 
 from werkzeug import urls
 from odoo import http
 from odoo.http import request
 from odoo.exceptions import ValidationError
 
+from odoo.addons.payment_midtrans import const, metrics
+
 _logger = logging.getLogger(__name__)
 
 
@@ -16,6 +17,7 @@ class MidtransController(http.Controller):
 
 
     @http.route('/payment/midtrans/get_snap_token', type='json', auth='public')
+    @metrics.timed_route('get_snap_token')
     def midtrans_get_snap_token(self, transaction_id, **kwargs):
         try:
             tx = request.env['payment.transaction'].sudo().browse(transaction_id)
@@ -28,20 +30,25 @@ class MidtransController(http.Controller):
                 _logger.error("Invalid provider for transaction %s: %s", transaction_id, tx.provider_code)
                 return {'error': 'Invalid payment provider'}
             
-            _logger.info("Getting snap token for transaction %s", tx.reference)
-            snap_data = tx._create_midtrans_transaction()
+            _logger.debug("Getting snap token for transaction %s", tx.reference)
+            snap_data = tx._midtrans_get_snap_data()
             
             return {
                 'snap_token': snap_data.get('snap_token'),
-                'snap_url': tx.provider_id._get_midtrans_snap_url(),
+                'snap_url': tx.provider_id._midtrans_get_config().snap_url,
                 'order_id': tx.midtrans_order_id
             }
             
+        except psycopg2.OperationalError:
+            # Serialization failure dari request paralel (double click): biarkan Odoo
+            # me-retry request sehingga retry memakai token yang sudah di-commit
+            raise
         except Exception as e:
             _logger.exception("Error getting Midtrans snap token for transaction %s", transaction_id)
             return {'error': str(e)}
 
     @http.route('/payment/midtrans/success', type='json', auth='public', csrf=False)
+    @metrics.timed_route('success')
     def midtrans_success(self, **post):
         """
         Handle payment success callback from JS
@@ -62,25 +69,10 @@ class MidtransController(http.Controller):
             
             # Verify transaction status dengan Midtrans
             order_id = tx.midtrans_order_id
-            provider = tx.provider_id
-            server_key = provider.midtrans_server_key
-            api_url = provider._get_midtrans_api_url()
-            
-            auth_string = base64.b64encode(f"{server_key}:".encode()).decode()
-            headers = {
-                'Accept': 'application/json',
-                'Authorization': f'Basic {auth_string}'
-            }
+            status_data = tx.provider_id._midtrans_make_request(f'/{order_id}/status', method='GET')
+            request.env['payment.midtrans.audit'].sudo()._log('status', [status_data])
             
-            response = requests.get(
-                f"{api_url}/{order_id}/status",
-                headers=headers,
-                timeout=10
-            )
-            response.raise_for_status()
-            status_data = response.json()
-            
-            _logger.info("Verified transaction status: %s", status_data.get('transaction_status'))
+            _logger.debug("Verified transaction status: %s", status_data.get('transaction_status'))
             
             # Update transaction status
             tx._handle_notification_data('midtrans', status_data)
@@ -91,17 +83,15 @@ class MidtransController(http.Controller):
                 'redirect_url': f'/payment/status?tx_id={tx.id}'
             }
             
+        except psycopg2.OperationalError:
+            raise
         except Exception as e:
             _logger.exception("Error in payment success callback")
             return {'success': False, 'message': str(e)}
 
     @http.route('/payment/midtrans/notification', type='json', auth='public', csrf=False)
+    @metrics.timed_route('notification')
     def midtrans_notification(self, **post):
-        _logger.info("="*80)
-        _logger.info("Midtrans notification received")
-        _logger.info("="*80)
-        _logger.info("Notification data:\n%s", pprint.pformat(post))
-        
         try:
             order_id = post.get('order_id')
             status_code = post.get('status_code')
@@ -112,84 +102,96 @@ class MidtransController(http.Controller):
                 _logger.error("Midtrans notification missing required fields")
                 return {'status': 'error', 'message': 'Missing required fields'}
             
+            if order_id.startswith(const.POS_ORDER_PREFIX):
+                # Charge QRIS POS selalu diproses langsung karena kasir sedang menunggu;
+                # signature diverifikasi sebelum apa pun dicatat, sama seperti transaksi web
+                PosCharge = request.env['payment.midtrans.pos.charge'].sudo()
+                charge_sudo = PosCharge._midtrans_get_charge_by_order_id(order_id)
+                if charge_sudo and not charge_sudo.provider_id._midtrans_verify_signature(post):
+                    return self._midtrans_reject_signature(order_id)
+                PosCharge._midtrans_handle_notification(post)
+                request.env['payment.midtrans.audit'].sudo()._log('notification', [post])
+                return {'status': 'ok'}
+            
             tx_sudo = request.env['payment.transaction'].sudo()._get_tx_from_notification_data(
                 'midtrans', post
             )
             
             provider = tx_sudo.provider_id
-            server_key = provider.midtrans_server_key
             
-            signature_string = f"{order_id}{status_code}{gross_amount}{server_key}"
-            calculated_signature = hashlib.sha512(signature_string.encode()).hexdigest()
+            if not provider._midtrans_verify_signature(post):
+                return self._midtrans_reject_signature(order_id)
             
-            if calculated_signature != signature_key:
-                _logger.warning(
-                    "Midtrans: Invalid signature for order %s. Expected: %s, Got: %s",
-                    order_id, calculated_signature, signature_key
-                )
-                return {'status': 'error', 'message': 'Invalid signature'}
+            # Hanya payload dengan signature valid yang masuk audit log
+            request.env['payment.midtrans.audit'].sudo()._log('notification', [post])
             
-            _logger.info("Signature verified successfully for order %s", order_id)
+            if provider._midtrans_get_config().notification_mode == 'async':
+                # Simpan ke inbox, diproses batch oleh cron agar webhook cepat selesai
+                request.env['payment.midtrans.notification'].sudo()._enqueue(provider, post)
+                return {'status': 'ok'}
             
             tx_sudo._handle_notification_data('midtrans', post)
             
-            _logger.info("Notification processed successfully for order %s", order_id)
+            _logger.info("Midtrans notification processed for order %s", order_id)
             return {'status': 'ok'}
             
         except ValidationError as e:
             _logger.exception("Midtrans notification validation error")
             return {'status': 'error', 'message': str(e)}
+        except psycopg2.OperationalError:
+            raise
         except Exception as e:
             _logger.exception("Unexpected error processing Midtrans notification")
             return {'status': 'error', 'message': 'Internal server error'}
 
+    @staticmethod
+    def _midtrans_reject_signature(order_id):
+        """Catat notifikasi dengan signature tidak valid dan kembalikan response error"""
+        metrics.signature_failures.inc()
+        _logger.warning("Midtrans: Invalid signature for order %s", order_id)
+        return {'status': 'error', 'message': 'Invalid signature'}
+
     @http.route('/payment/midtrans/return', type='http', auth='public', csrf=False, save_session=False)
+    @metrics.timed_route('return')
     def midtrans_return(self, **post):
-
-        _logger.info("="*80)
-        _logger.info("Midtrans return from payment page")
-        _logger.info("="*80)
-        _logger.info("Return data:\n%s", pprint.pformat(post))
-        
         order_id = post.get('order_id')
         
         if order_id:
             try:
-                tx_sudo = request.env['payment.transaction'].sudo().search([
-                    ('midtrans_order_id', '=', order_id)
-                ], limit=1)
+                tx_sudo = request.env['payment.transaction'].sudo()._midtrans_get_tx_by_order_id(
+                    order_id
+                )
                 
                 if tx_sudo:
-                    provider = tx_sudo.provider_id
-                    server_key = provider.midtrans_server_key
-                    api_url = provider._get_midtrans_api_url()
-                    
-                    auth_string = base64.b64encode(f"{server_key}:".encode()).decode()
-                    headers = {
-                        'Accept': 'application/json',
-                        'Authorization': f'Basic {auth_string}'
-                    }
-                    
-                    _logger.info("Verifying transaction status for order %s", order_id)
-                    response = requests.get(
-                        f"{api_url}/{order_id}/status",
-                        headers=headers,
-                        timeout=10
-                    )
-                    response.raise_for_status()
-                    status_data = response.json()
-                    
-                    _logger.info("Status verification response:\n%s", pprint.pformat(status_data))
-                    
-                    tx_sudo._handle_notification_data('midtrans', status_data)
-                    
-                    _logger.info("Transaction status updated successfully for order %s", order_id)
+                    # Query string bisa dipalsukan; catat hanya jika order id dikenal
+                    request.env['payment.midtrans.audit'].sudo()._log('return', [post])
+                    # Verifikasi status dilakukan di background agar worker langsung bebas;
+                    # halaman /payment/status melihat state final lewat /payment/status/poll (core).
+                    tx_sudo._midtrans_schedule_status_check()
+                    _logger.debug("Status verification scheduled for order %s", order_id)
                     
             except Exception as e:
-                _logger.exception("Error verifying Midtrans transaction status for order %s", order_id)
+                _logger.exception("Error scheduling Midtrans status verification for order %s", order_id)
         
         return request.redirect('/payment/status')
     
+    @http.route('/payment/midtrans/metrics', type='http', auth='public', methods=['GET'], save_session=False)
+    def midtrans_metrics(self, token=None, **kwargs):
+        """
+        Metrics dalam format teks Prometheus, gabungan semua worker process.
+        Hanya aktif jika system parameter `payment_midtrans.metrics_token` diisi.
+        """
+        expected_token = request.env['ir.config_parameter'].sudo().get_param(const.METRICS_TOKEN_PARAM)
+        auth_header = request.httprequest.headers.get('Authorization', '')
+        if auth_header.startswith('Bearer '):
+            token = auth_header[len('Bearer '):]
+        if not expected_token or not token or not hmac.compare_digest(token, expected_token):
+            return request.not_found()
+        
+        return request.make_response(
+            metrics.render(request.db), headers=[('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')]
+        )
+
     @http.route('/payment/midtrans/webhook', type='json', auth='public', csrf=False)
     def midtrans_webhook(self, **post):
         return self.midtrans_notification(**post)
\ No newline at end of file
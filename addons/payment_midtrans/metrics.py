@@ -0,0 +1,264 @@
+"""Instrumentasi ringan untuk addon Midtrans.
+
+Counter dan histogram dicatat di memori per worker process. Setiap worker secara
+berkala (dan saat di-scrape) menambahkan delta-nya ke tabel `payment_midtrans_metric`
+lewat cursor terpisah, sehingga route `/payment/midtrans/metrics` merender nilai
+gabungan semua worker, dan histori tetap ada saat worker di-recycle.
+"""
+import functools
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+
+from odoo import sql_db
+from odoo.http import request
+
+from odoo.addons.payment_midtrans import const
+
+_logger = logging.getLogger(__name__)
+
+# Batas bucket histogram latency (detik)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_metrics = {}
+
+# Nilai yang sudah di-flush ke tabel bersama: {(series, labels json): value}
+_flush_lock = threading.Lock()
+_flushed = {}
+_flushed_at = 0.0
+
+
+class Counter:
+
+    kind = 'counter'
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def samples(self):
+        with _lock:
+            values = dict(self._values)
+        for key, value in values.items():
+            yield self.name, dict(key), value
+
+
+class Histogram:
+
+    kind = 'histogram'
+
+    def __init__(self, name, description, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self._values = {}  # {labels: [bucket counts..., sum, count]}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def get(self, **labels):
+        """Return (sum, count) of the observations with the given labels"""
+        data = self._values.get(tuple(sorted(labels.items())))
+        return (data[-2], data[-1]) if data else (0.0, 0)
+
+    def samples(self):
+        with _lock:
+            values = {key: list(data) for key, data in self._values.items()}
+        for key, data in values.items():
+            labels = dict(key)
+            for bound, count in zip(self.buckets, data):
+                yield f'{self.name}_bucket', dict(labels, le=repr(bound)), count
+            yield f'{self.name}_bucket', dict(labels, le='+Inf'), data[-1]
+            yield f'{self.name}_sum', labels, data[-2]
+            yield f'{self.name}_count', labels, data[-1]
+
+
+def _register(metric):
+    _metrics[metric.name] = metric
+    return metric
+
+
+route_duration = _register(Histogram(
+    'midtrans_route_duration_seconds', "Latency of Midtrans controller routes",
+))
+api_duration = _register(Histogram(
+    'midtrans_api_request_duration_seconds', "Latency of outbound Midtrans API calls",
+))
+api_errors = _register(Counter(
+    'midtrans_api_errors_total', "Failed outbound Midtrans API calls",
+))
+api_new_connections = _register(Counter(
+    'midtrans_api_new_connections_total', "New TCP connections opened to Midtrans",
+))
+signature_failures = _register(Counter(
+    'midtrans_signature_failures_total', "Notifications rejected because of an invalid signature",
+))
+notifications_suppressed = _register(Counter(
+    'midtrans_notifications_suppressed_total', "Notifications skipped before any state change",
+))
+notification_processing = _register(Histogram(
+    'midtrans_notification_processing_seconds', "Time spent in _process_notification_data",
+))
+route_sql_queries = _register(Histogram(
+    'midtrans_route_sql_queries', "SQL queries executed per Midtrans controller route",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+))
+
+
+def get_endpoint_label(endpoint):
+    """Normalisasi endpoint agar order id tidak menjadi label (mis. '/{order_id}/status')"""
+    segments = endpoint.strip('/').split('/')
+    if len(segments) == 2 and segments[0] != 'snap':
+        segments[0] = '{order_id}'
+    return '/' + '/'.join(segments)
+
+
+def _get_dbname():
+    return request and request.db
+
+
+def _get_sql_count():
+    cr = request and request.env and request.env.cr
+    return getattr(cr, 'sql_log_count', None)
+
+
+def timed_route(route):
+    """Decorator untuk mencatat latency dan jumlah query SQL route controller"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            sql_count_before = _get_sql_count()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                route_duration.observe(time.perf_counter() - start, route=route)
+                sql_count_after = _get_sql_count()
+                if sql_count_before is not None and sql_count_after is not None:
+                    route_sql_queries.observe(sql_count_after - sql_count_before, route=route)
+                maybe_flush(_get_dbname())
+        return wrapper
+    return decorator
+
+
+def _collect():
+    """Snapshot semua sample proses ini: {(series, labels json): value}"""
+    return {
+        (name, json.dumps(labels, sort_keys=True)): value
+        for metric in _metrics.values()
+        for name, labels, value in metric.samples()
+    }
+
+
+def flush(dbname):
+    """Tambahkan delta metric proses ini sejak flush terakhir ke tabel bersama
+
+    :return: True jika tabel bersama sudah memuat semua nilai proses ini
+    :rtype: bool
+    """
+    global _flushed_at
+    with _flush_lock:
+        _flushed_at = time.time()
+        current = _collect()
+        # Urutan key tetap agar UPSERT paralel dari beberapa worker tidak deadlock
+        deltas = sorted(
+            (series, labels, value - _flushed.get((series, labels), 0))
+            for (series, labels), value in current.items()
+            if value != _flushed.get((series, labels), 0)
+        )
+        if not deltas:
+            return True
+        try:
+            with sql_db.db_connect(dbname).cursor() as cr:
+                cr.execute("""
+                    INSERT INTO payment_midtrans_metric AS metric (series, labels, value)
+                    SELECT * FROM unnest(%s::varchar[], %s::varchar[], %s::float8[])
+                    ON CONFLICT (series, labels) DO UPDATE
+                       SET value = metric.value + EXCLUDED.value
+                """, [list(column) for column in zip(*deltas)])
+        except Exception:  # noqa: BLE001 - metric tidak boleh menggagalkan request
+            _logger.exception("Unable to flush Midtrans metrics")
+            return False
+        _flushed.update(current)
+        return True
+
+
+def maybe_flush(dbname):
+    """Flush jika interval flush sudah lewat; dipanggil dari hot path"""
+    if dbname and time.time() - _flushed_at >= const.METRICS_FLUSH_INTERVAL:
+        flush(dbname)
+
+
+def _sample_sort_key(row):
+    series, labels, _value = row
+    labels = json.loads(labels)
+    le = labels.pop('le', None)
+    return series, sorted(labels.items()), math.inf if le == '+Inf' else float(le or 0)
+
+
+def _read_shared(dbname):
+    """Baca nilai gabungan semua worker: {metric name: [(series, labels, value)]}"""
+    try:
+        with sql_db.db_connect(dbname).cursor() as cr:
+            cr.execute("SELECT series, labels, value FROM payment_midtrans_metric")
+            rows = cr.fetchall()
+    except Exception:  # noqa: BLE001 - fallback ke metric proses ini
+        _logger.exception("Unable to read shared Midtrans metrics")
+        return None
+    samples = defaultdict(list)
+    for series, labels, value in sorted(rows, key=_sample_sort_key):
+        family = series if series in _metrics else series.rsplit('_', 1)[0]
+        samples[family].append((series, json.loads(labels), value))
+    return samples
+
+
+def render(dbname=None):
+    """Render semua metric dalam format teks Prometheus
+
+    Dengan `dbname`, delta proses ini di-flush lalu nilai gabungan semua worker dibaca
+    dari tabel bersama. Tanpa `dbname` (atau jika database gagal diakses) hanya metric
+    proses ini yang dirender, dengan label `pid`.
+    """
+    samples = None
+    if dbname and flush(dbname):
+        samples = _read_shared(dbname)
+    if samples is None:
+        pid = str(os.getpid())
+        samples = {
+            metric.name: [(name, dict(labels, pid=pid), value) for name, labels, value in metric.samples()]
+            for metric in _metrics.values()
+        }
+    lines = []
+    for metric in _metrics.values():
+        lines.append(f'# HELP {metric.name} {metric.description}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for name, labels, value in samples.get(metric.name, ()):
+            label_str = ','.join(
+                '{}="{}"'.format(key, str(val).replace('\\', '\\\\').replace('"', '\\"'))
+                for key, val in sorted(labels.items())
+            )
+            lines.append(f'{name}{{{label_str}}} {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,200 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from odoo.addons.payment_midtrans import const, metrics
+from odoo.addons.payment_midtrans.circuit_breaker import CircuitBreaker
+
+_logger = logging.getLogger(__name__)
+
+# Registry client per worker process: {(dbname, provider_id): MidtransClient}
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class MidtransClient:
+    """HTTP client Midtrans dengan keep-alive connection pool.
+
+    Satu instance dipakai bersama oleh semua outbound call untuk satu provider
+    di satu worker process, sehingga koneksi TCP+TLS tidak dibuka ulang untuk
+    setiap request. Client ini tidak bergantung pada ORM sehingga aman dipakai
+    dari thread lain.
+
+    Read timeout menyesuaikan p99 latency yang teramati, dan semua call melewati
+    circuit breaker (jika diberikan) agar fail fast saat Midtrans bermasalah.
+    """
+
+    def __init__(self, api_url, auth_header, connect_timeout=const.CONNECT_TIMEOUT,
+                 read_timeout=const.READ_TIMEOUT, pool_maxsize=const.POOL_MAXSIZE, breaker=None,
+                 dbname=None):
+        self.api_url = api_url.rstrip('/')
+        self.dbname = dbname
+        self.auth_header = auth_header
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker
+        self.pid = os.getpid()
+        self._latencies = deque(maxlen=const.ADAPTIVE_TIMEOUT_SAMPLE_SIZE)
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Accept': 'application/json',
+            'Content-Type': 'application/json',
+            'Authorization': auth_header,
+        })
+        adapter = HTTPAdapter(pool_connections=const.POOL_CONNECTIONS, pool_maxsize=pool_maxsize)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'calls': 0,
+            'errors': 0,
+            'new_connections': 0,
+            'total_time': 0.0,
+        }
+
+    def matches(self, api_url, auth_header):
+        """Cek apakah client masih sesuai dengan konfigurasi provider"""
+        return (
+            self.pid == os.getpid()
+            and self.api_url == api_url.rstrip('/')
+            and self.auth_header == auth_header
+        )
+
+    def request(self, method, endpoint, payload=None, timeout=None):
+        """Kirim request ke Midtrans dan kembalikan response JSON.
+
+        :param str method: HTTP method, mis. 'GET' atau 'POST'
+        :param str endpoint: path relatif terhadap API URL, mis. '/{order_id}/status'
+        :param dict payload: body JSON untuk request
+        :param tuple timeout: override (connect, read) timeout
+        :return: response JSON dari Midtrans
+        :rtype: dict
+        :raise requests.exceptions.RequestException: jika request gagal
+        """
+        url = f"{self.api_url}/{endpoint.lstrip('/')}"
+        probe = self.breaker.before_call() if self.breaker else False
+        try:
+            if not timeout:
+                # Probe half-open memakai timeout penuh agar tidak gagal karena timeout adaptif
+                timeout = self.timeout if probe else self.get_timeout()
+            pool = self._get_pool(url)
+            connections_before = pool.num_connections if pool else 0
+
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, json=payload, timeout=timeout)
+                response.raise_for_status()
+                result = response.json()
+            except (requests.exceptions.RequestException, ValueError) as e:
+                elapsed = self._record(endpoint, start, pool, connections_before, error=True)
+                if isinstance(e, requests.exceptions.Timeout):
+                    # Sampel tersensor (latency sebenarnya >= elapsed); tanpa ini p99 tidak
+                    # bisa naik saat Midtrans melambat di atas timeout adaptif
+                    self._latencies.append(elapsed)
+                if self.breaker:
+                    self.breaker.after_call(elapsed, self._is_outage(e), probe=probe)
+                raise
+            elapsed = self._record(endpoint, start, pool, connections_before)
+            self._latencies.append(elapsed)
+            if self.breaker:
+                self.breaker.after_call(elapsed, False, probe=probe)
+            _logger.debug("Midtrans %s %s selesai dalam %.1f ms", method, endpoint, elapsed * 1000)
+            return result
+        finally:
+            if probe:
+                # Probe yang berakhir dengan exception lain tidak boleh menahan claim selamanya
+                self.breaker.release_probe()
+
+    def get(self, endpoint, **kwargs):
+        return self.request('GET', endpoint, **kwargs)
+
+    def post(self, endpoint, payload=None, **kwargs):
+        return self.request('POST', endpoint, payload=payload, **kwargs)
+
+    def get_timeout(self):
+        """Hitung (connect, read) timeout dari p99 latency yang teramati"""
+        latencies = sorted(self._latencies)
+        if len(latencies) < const.ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+            return self.timeout
+        p99 = latencies[int(0.99 * (len(latencies) - 1))]
+        read_timeout = min(
+            max(p99 * const.ADAPTIVE_TIMEOUT_FACTOR, const.MIN_READ_TIMEOUT), self.timeout[1]
+        )
+        return (self.timeout[0], read_timeout)
+
+    def get_stats(self):
+        """Snapshot statistik pemakaian client, termasuk rasio reuse koneksi"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        calls = stats['calls']
+        stats['avg_time'] = stats['total_time'] / calls if calls else 0.0
+        stats['reuse_rate'] = 1 - stats['new_connections'] / calls if calls else 0.0
+        return stats
+
+    def close(self):
+        self.session.close()
+
+    @staticmethod
+    def _is_outage(error):
+        """Error yang menandakan Midtrans bermasalah (bukan kesalahan request kita)"""
+        if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return True
+        response = getattr(error, 'response', None)
+        return response is not None and response.status_code >= 500
+
+    def _get_pool(self, url):
+        try:
+            return self.session.get_adapter(url).poolmanager.connection_from_url(url)
+        except Exception:  # noqa: BLE001 - statistik tidak boleh menggagalkan request
+            return None
+
+    def _record(self, endpoint, start, pool, connections_before, error=False):
+        elapsed = time.perf_counter() - start
+        new_connections = max((pool.num_connections - connections_before) if pool else 0, 0)
+        with self._stats_lock:
+            self.stats['calls'] += 1
+            self.stats['total_time'] += elapsed
+            self.stats['new_connections'] += new_connections
+            if error:
+                self.stats['errors'] += 1
+
+        label = metrics.get_endpoint_label(endpoint)
+        metrics.api_duration.observe(elapsed, endpoint=label)
+        if new_connections:
+            metrics.api_new_connections.inc(new_connections, endpoint=label)
+        if error:
+            metrics.api_errors.inc(endpoint=label)
+        # Cron dan worker tanpa request HTTP juga menyetor metric-nya ke tabel bersama
+        metrics.maybe_flush(self.dbname)
+        return elapsed
+
+
+def get_client(dbname, provider_id, api_url, auth_header):
+    """Ambil client bersama untuk provider, buat baru bila belum ada atau config berubah.
+
+    :param str dbname: nama database provider
+    :param int provider_id: id `payment.provider`
+    :param str api_url: base URL API Midtrans
+    :param str auth_header: header Authorization yang sudah dibangun
+    :rtype: MidtransClient
+    """
+    key = (dbname, provider_id)
+    client = _clients.get(key)
+    if client and client.matches(api_url, auth_header):
+        return client
+    with _clients_lock:
+        client = _clients.get(key)
+        if not client or not client.matches(api_url, auth_header):
+            if client:
+                client.close()
+            client = MidtransClient(
+                api_url, auth_header, breaker=CircuitBreaker(dbname, provider_id), dbname=dbname
+            )
+            _clients[key] = client
+    return client
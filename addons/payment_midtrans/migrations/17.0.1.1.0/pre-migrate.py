@@ -0,0 +1,32 @@
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """Kosongkan midtrans_order_id duplikat sebelum unique constraint dibuat.
+
+    Untuk setiap order id duplikat, baris yang dipertahankan adalah baris yang id-nya
+    sama dengan suffix order id (`{reference}-{id}`), atau baris terbaru jika tidak ada.
+    """
+    if not version:
+        return
+
+    cr.execute("""
+        WITH ranked AS (
+            SELECT id,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY midtrans_order_id
+                       ORDER BY (midtrans_order_id = reference || '-' || id) DESC, id DESC
+                   ) AS rank
+              FROM payment_transaction
+             WHERE midtrans_order_id IS NOT NULL
+        )
+        UPDATE payment_transaction tx
+           SET midtrans_order_id = NULL
+          FROM ranked
+         WHERE ranked.id = tx.id
+           AND ranked.rank > 1
+    """)
+    if cr.rowcount:
+        _logger.warning("Cleared %s duplicate Midtrans order ids", cr.rowcount)
@@ -0,0 +1,10 @@
+from odoo import SUPERUSER_ID, api
+
+
+def migrate(cr, version):
+    """Isi agregat dashboard dari histori transaksi yang sudah ada"""
+    if not version:
+        return
+
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['payment.midtrans.stats']._rebuild_stats()
@@ -0,0 +1,13 @@
+from odoo import SUPERUSER_ID, api
+
+
+def migrate(cr, version):
+    """Pasang inline form Snap pada provider Midtrans yang sudah ada (data provider noupdate),
+    dan hitung ulang agregat dashboard tanpa transaksi refund"""
+    if not version:
+        return
+
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    providers = env['payment.provider'].search([('code', '=', 'midtrans'), ('inline_form_view_id', '=', False)])
+    providers.write({'inline_form_view_id': env.ref('payment_midtrans.midtrans_inline_form').id})
+    env['payment.midtrans.stats']._rebuild_stats()
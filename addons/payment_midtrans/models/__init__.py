@@ -1,2 +1,9 @@
 from . import payment_provider
 from . import payment_transaction
+from . import payment_midtrans_notification
+from . import payment_midtrans_pos_charge
+from . import pos_payment_method
+from . import payment_midtrans_settlement
+from . import payment_midtrans_stats
+from . import payment_midtrans_audit
+from . import payment_midtrans_metric
@@ -0,0 +1,111 @@
+import json
+import logging
+import zlib
+from datetime import timedelta
+
+import psycopg2
+
+from odoo import api, fields, models
+
+from odoo.addons.payment_midtrans import const
+
+_logger = logging.getLogger(__name__)
+
+
+class PaymentMidtransAudit(models.Model):
+    """Log audit payload mentah dari Midtrans (notifikasi dan response status).
+
+    Payload disimpan sebagai JSON terkompresi zlib di kolom bytea dan ditulis lewat
+    satu INSERT per batch. Baris lebih tua dari periode retensi dihapus bertahap oleh
+    autovacuum sehingga ukuran tabel tetap terbatas.
+    """
+    _name = 'payment.midtrans.audit'
+    _description = 'Midtrans Audit Log'
+    _order = 'received_at desc, id desc'
+    _log_access = False
+
+    received_at = fields.Datetime(string='Received At', required=True, readonly=True)
+    order_id = fields.Char(string='Midtrans Order ID', readonly=True)
+    source = fields.Selection(
+        [
+            ('notification', 'Notification'),
+            ('return', 'Customer Return'),
+            ('status', 'Status Check'),
+            ('action', 'Cancel/Expire/Refund'),
+        ],
+        string='Source',
+        required=True,
+        readonly=True,
+    )
+    transaction_status = fields.Char(string='Transaction Status', readonly=True)
+    payload_zlib = fields.Binary(string='Compressed Payload', attachment=False, readonly=True)
+    payload = fields.Text(string='Payload', compute='_compute_payload')
+
+    def init(self):
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS payment_midtrans_audit_order_id_received_at_idx
+                ON payment_midtrans_audit (order_id, received_at DESC)
+        """)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS payment_midtrans_audit_received_at_idx
+                ON payment_midtrans_audit (received_at)
+        """)
+
+    def _compute_payload(self):
+        for audit in self.with_context(bin_size=False):
+            data = audit.payload_zlib
+            audit.payload = data and json.dumps(
+                json.loads(zlib.decompress(bytes(data))), indent=2, sort_keys=True
+            )
+
+    @api.model
+    def _log(self, source, payloads):
+        """Simpan satu atau beberapa payload Midtrans dalam satu INSERT.
+
+        :param str source: asal payload, lihat field `source`
+        :param list payloads: list dict payload (notifikasi atau response API)
+        """
+        payloads = [payload for payload in payloads if isinstance(payload, dict)]
+        if not payloads:
+            return
+        columns = list(zip(*(
+            (
+                payload.get('order_id'),
+                payload.get('transaction_status'),
+                psycopg2.Binary(zlib.compress(
+                    json.dumps(payload, separators=(',', ':'), default=str).encode(),
+                    const.AUDIT_COMPRESSION_LEVEL,
+                )),
+            )
+            for payload in payloads
+        )))
+        self.env.cr.execute("""
+            INSERT INTO payment_midtrans_audit (received_at, source, order_id, transaction_status, payload_zlib)
+            SELECT NOW() AT TIME ZONE 'UTC', %s, v.order_id, v.transaction_status, v.payload_zlib
+              FROM unnest(%s::varchar[], %s::varchar[], %s::bytea[]) AS v(order_id, transaction_status, payload_zlib)
+        """, [source] + [list(column) for column in columns])
+
+    @api.autovacuum
+    def _gc_audit_log(self):
+        """Hapus log audit yang melewati periode retensi, per batch agar lock tetap singkat"""
+        retention_days = int(self.env['ir.config_parameter'].sudo().get_param(
+            const.AUDIT_RETENTION_DAYS_PARAM, const.AUDIT_RETENTION_DAYS
+        ))
+        limit_date = fields.Datetime.now() - timedelta(days=retention_days)
+        total = 0
+        while True:
+            self.env.cr.execute("""
+                DELETE FROM payment_midtrans_audit
+                 WHERE id IN (
+                        SELECT id
+                          FROM payment_midtrans_audit
+                         WHERE received_at < %s
+                         LIMIT %s
+                       )
+            """, [limit_date, const.AUDIT_PRUNE_BATCH_SIZE])
+            total += self.env.cr.rowcount
+            if self.env.cr.rowcount < const.AUDIT_PRUNE_BATCH_SIZE:
+                break
+            self.env.cr.commit()
+        if total:
+            _logger.info("Midtrans: pruned %s audit log entries older than %s days", total, retention_days)
@@ -0,0 +1,22 @@
+from odoo import fields, models
+
+
+class PaymentMidtransMetric(models.Model):
+    """Nilai kumulatif metric Prometheus, dijumlahkan dari semua worker process.
+
+    Setiap worker menyimpan metric di memori lalu secara berkala menambahkan delta-nya
+    ke tabel ini lewat UPSERT (lihat `metrics.flush`), sehingga route
+    `/payment/midtrans/metrics` memberi angka yang sama di worker mana pun dan histori
+    tidak hilang saat worker di-recycle. Ditulis tanpa ORM; model ini hanya untuk skema.
+    """
+    _name = 'payment.midtrans.metric'
+    _description = 'Midtrans Metric Sample'
+    _log_access = False
+
+    series = fields.Char(string='Series', required=True, readonly=True)
+    labels = fields.Char(string='Labels', required=True, readonly=True, help='Label dalam JSON, key terurut')
+    value = fields.Float(string='Value', required=True, readonly=True)
+
+    _sql_constraints = [
+        ('series_labels_uniq', 'unique(series, labels)', 'Only one row per metric series and label set.'),
+    ]
@@ -0,0 +1,175 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+from odoo.addons.payment_midtrans import const, utils as midtrans_utils
+
+_logger = logging.getLogger(__name__)
+
+
+class PaymentMidtransNotification(models.Model):
+    _name = 'payment.midtrans.notification'
+    _description = 'Midtrans Notification Inbox'
+    _order = 'id'
+
+    provider_id = fields.Many2one(
+        'payment.provider', string='Provider', required=True, ondelete='cascade'
+    )
+    order_id = fields.Char(string='Midtrans Order ID', required=True, index=True)
+    payload = fields.Json(string='Payload', required=True)
+    state = fields.Selection(
+        [
+            ('pending', 'Pending'),
+            ('done', 'Done'),
+            ('error', 'Error'),
+        ],
+        string='Status',
+        default='pending',
+        required=True,
+    )
+    attempts = fields.Integer(string='Attempts', default=0)
+    next_attempt = fields.Datetime(string='Next Attempt', default=fields.Datetime.now)
+    last_error = fields.Text(string='Last Error')
+
+    def init(self):
+        # Partial index untuk query claim inbox (hanya baris yang masih pending)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS payment_midtrans_notification_pending_idx
+                ON payment_midtrans_notification (next_attempt, id)
+             WHERE state = 'pending'
+        """)
+
+    @api.model
+    def _enqueue(self, provider, notification_data):
+        """Simpan notifikasi mentah ke inbox dan jadwalkan cron pemrosesan.
+
+        :param recordset provider: `payment.provider` pengirim notifikasi
+        :param dict notification_data: payload notifikasi dari Midtrans
+        :return: record inbox yang dibuat
+        """
+        notification = self.create({
+            'provider_id': provider.id,
+            'order_id': notification_data['order_id'],
+            'payload': notification_data,
+        })
+        self.env.ref('payment_midtrans.ir_cron_midtrans_process_inbox')._trigger()
+        return notification
+
+    @api.model
+    def _cron_process_inbox(self):
+        """Drain inbox secara batch, opsional dengan beberapa worker paralel"""
+        ICP = self.env['ir.config_parameter'].sudo()
+        batch_size = int(ICP.get_param(const.INBOX_BATCH_SIZE_PARAM, const.INBOX_BATCH_SIZE))
+        workers = int(ICP.get_param(const.INBOX_WORKERS_PARAM, const.INBOX_WORKERS))
+
+        if workers <= 1:
+            self._process_inbox(batch_size)
+            return
+
+        # Setiap worker memakai cursor sendiri; baris di-claim dengan SKIP LOCKED
+        # sehingga worker tidak saling menunggu.
+        self.env.cr.commit()
+        dbname, uid, context = self.env.cr.dbname, self.env.uid, self.env.context
+
+        def _worker():
+            threading.current_thread().dbname = dbname
+            with self.pool.cursor() as cr:
+                env = api.Environment(cr, uid, context)
+                env[self._name]._process_inbox(batch_size)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_worker) for _i in range(workers)]
+            for future in futures:
+                future.result()
+
+    def _process_inbox(self, batch_size):
+        """Claim dan proses batch inbox sampai tidak ada lagi yang siap diproses"""
+        while True:
+            notifications = self._claim_batch(batch_size)
+            if not notifications:
+                break
+            notifications._process()
+            self.env.cr.commit()
+
+    @api.model
+    def _claim_batch(self, batch_size):
+        self.env.cr.execute("""
+            SELECT id
+              FROM payment_midtrans_notification
+             WHERE state = 'pending'
+               AND next_attempt <= NOW() AT TIME ZONE 'UTC'
+             ORDER BY next_attempt, id
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+        """, [batch_size])
+        return self.browse(row[0] for row in self.env.cr.fetchall())
+
+    def _process(self):
+        ICP = self.env['ir.config_parameter'].sudo()
+        backoff = int(ICP.get_param(const.INBOX_RETRY_BACKOFF_PARAM, const.INBOX_RETRY_BACKOFF))
+        max_attempts = int(ICP.get_param(const.INBOX_MAX_ATTEMPTS_PARAM, const.INBOX_MAX_ATTEMPTS))
+
+        PaymentTransaction = self.env['payment.transaction'].sudo()
+        try:
+            with self.env.cr.savepoint():
+                locked = PaymentTransaction._midtrans_process_notifications_batch(self.mapped('payload'))
+        except Exception:
+            _logger.exception("Midtrans: batch inbox processing failed, processing notifications one by one")
+        else:
+            # Order yang sedang diproses request lain (in-flight) tidak di-lock oleh batch;
+            # notifikasinya tetap pending dan dicoba lagi setelah backoff
+            deferred = self._filter_in_flight(locked)
+            deferred.write({'next_attempt': fields.Datetime.now() + timedelta(seconds=backoff)})
+            (self - deferred).write({'state': 'done', 'last_error': False})
+            return
+
+        done = self.browse()
+        for notification in self:
+            try:
+                with self.env.cr.savepoint():
+                    PaymentTransaction.with_context(midtrans_from_inbox=True)._handle_notification_data(
+                        'midtrans', notification.payload
+                    )
+            except midtrans_utils.NotificationDeferred:
+                # Order sedang diproses request lain; coba lagi nanti tanpa menghitung attempt
+                notification.next_attempt = fields.Datetime.now() + timedelta(seconds=backoff)
+            except Exception as e:
+                attempts = notification.attempts + 1
+                _logger.warning(
+                    "Midtrans: failed to process inbox notification %s for order %s (attempt %s): %s",
+                    notification.id, notification.order_id, attempts, e
+                )
+                notification.write({
+                    'attempts': attempts,
+                    'last_error': str(e),
+                    'state': 'error' if attempts >= max_attempts else 'pending',
+                    'next_attempt': fields.Datetime.now() + timedelta(
+                        seconds=backoff * 2 ** (attempts - 1)
+                    ),
+                })
+            else:
+                done |= notification
+        done.write({'state': 'done', 'last_error': False})
+
+    def _filter_in_flight(self, locked):
+        """Get the notifications the batch skipped because their order was locked
+
+        :param recordset locked: transaksi yang diproses oleh batch
+        :return: notifikasi yang transaksinya tidak di-lock tetapi masih perlu diproses
+        """
+        txs = self.env['payment.transaction'].sudo()._midtrans_get_txs_by_order_ids(self.mapped('order_id'))
+        tx_by_order_id = {tx.midtrans_order_id: tx for tx in txs - locked}
+        return self.filtered(
+            lambda notification: notification.order_id in tx_by_order_id
+            and notification.payload.get('transaction_status')
+            and not tx_by_order_id[notification.order_id]._midtrans_get_skip_reason(notification.payload)
+        )
+
+    @api.autovacuum
+    def _gc_processed_notifications(self):
+        """Hapus notifikasi yang sudah diproses setelah periode retensi"""
+        limit_date = fields.Datetime.now() - timedelta(days=const.INBOX_DONE_RETENTION_DAYS)
+        self.search([('state', '=', 'done'), ('write_date', '<', limit_date)]).unlink()
@@ -0,0 +1,186 @@
+import logging
+import secrets
+from datetime import timedelta
+
+import requests
+
+from odoo import _, api, fields, models
+from odoo.exceptions import UserError, ValidationError
+
+from odoo.addons.payment_midtrans import const
+
+_logger = logging.getLogger(__name__)
+
+
+class PaymentMidtransPosCharge(models.Model):
+    _name = 'payment.midtrans.pos.charge'
+    _description = 'Midtrans POS QRIS Charge'
+    _order = 'id desc'
+
+    provider_id = fields.Many2one(
+        'payment.provider', string='Provider', required=True, ondelete='restrict'
+    )
+    payment_method_id = fields.Many2one(
+        'pos.payment.method', string='POS Payment Method', required=True, ondelete='cascade'
+    )
+    pos_session_id = fields.Many2one(
+        'pos.session', string='POS Session', required=True, ondelete='cascade', index=True
+    )
+    pos_order_ref = fields.Char(string='POS Order Reference')
+    order_id = fields.Char(string='Midtrans Order ID', readonly=True, copy=False)
+    midtrans_transaction_id = fields.Char(string='Midtrans Transaction ID', readonly=True)
+    amount = fields.Monetary(string='Amount', required=True, currency_field='currency_id')
+    currency_id = fields.Many2one('res.currency', string='Currency', required=True)
+    state = fields.Selection(
+        [
+            ('draft', 'Draft'),
+            ('pending', 'Waiting for Payment'),
+            ('done', 'Paid'),
+            ('cancel', 'Cancelled'),
+            ('error', 'Error'),
+        ],
+        string='Status',
+        default='draft',
+        required=True,
+    )
+    qr_string = fields.Char(string='QR String', readonly=True)
+    qr_url = fields.Char(string='QR Image URL', readonly=True)
+    expires_at = fields.Datetime(string='Expires At', readonly=True)
+    # Channel bus yang tidak bisa ditebak; hanya POS yang membuat charge yang mengetahuinya
+    bus_channel = fields.Char(
+        string='Bus Channel', readonly=True, copy=False, groups='base.group_system'
+    )
+
+    _sql_constraints = [
+        ('order_id_uniq', 'unique(order_id)', "Midtrans order id must be unique."),
+    ]
+
+    @api.model
+    def _midtrans_create_charge(self, payment_method, pos_session, amount, pos_order_ref=None):
+        """Buat charge QRIS lewat Core API Midtrans untuk terminal POS.
+
+        :param recordset payment_method: `pos.payment.method` dengan terminal midtrans
+        :param recordset pos_session: sesi POS yang menunggu pembayaran
+        :param float amount: nominal yang harus dibayar
+        :param str pos_order_ref: referensi order POS, hanya untuk informasi
+        :return: data yang dibutuhkan POS untuk menampilkan QR dan menunggu notifikasi bus
+        :rtype: dict
+        """
+        provider = payment_method.midtrans_provider_id
+        if not provider or provider.code != 'midtrans' or provider.state == 'disabled':
+            raise UserError(_("No enabled Midtrans provider is configured on %s.", payment_method.name))
+
+        currency = pos_session.currency_id
+        charge = self.create({
+            'provider_id': provider.id,
+            'payment_method_id': payment_method.id,
+            'pos_session_id': pos_session.id,
+            'pos_order_ref': pos_order_ref,
+            'amount': amount,
+            'currency_id': currency.id,
+            'bus_channel': secrets.token_urlsafe(24),
+        })
+        charge.order_id = f"{const.POS_ORDER_PREFIX}{pos_session.id}-{charge.id}"
+
+        payload = {
+            'payment_type': 'qris',
+            'transaction_details': {
+                'order_id': charge.order_id,
+                'gross_amount': int(currency.round(amount)),
+            },
+            'qris': {'acquirer': 'gopay'},
+            'custom_expiry': {
+                'expiry_duration': const.POS_QRIS_EXPIRY_MINUTES,
+                'unit': 'minute',
+            },
+        }
+        try:
+            result = provider._midtrans_make_request('/charge', payload=payload)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            _logger.exception("Midtrans QRIS charge failed for order %s", charge.order_id)
+            charge.state = 'error'
+            raise UserError(_("Unable to create Midtrans QRIS payment: %s", e))
+
+        qr_url = next(
+            (action.get('url') for action in result.get('actions', [])
+             if action.get('name') == 'generate-qr-code'),
+            False
+        )
+        charge.write({
+            'state': 'pending',
+            'midtrans_transaction_id': result.get('transaction_id'),
+            'qr_string': result.get('qr_string'),
+            'qr_url': qr_url,
+            'expires_at': fields.Datetime.now() + timedelta(minutes=const.POS_QRIS_EXPIRY_MINUTES),
+        })
+        _logger.info("Midtrans QRIS charge %s created for POS session %s", charge.order_id, pos_session.id)
+        return charge._midtrans_get_pos_data()
+
+    def _midtrans_get_pos_data(self):
+        self.ensure_one()
+        return {
+            'order_id': self.order_id,
+            'state': self.state,
+            'qr_string': self.qr_string,
+            'qr_url': self.qr_url,
+            'expires_at': fields.Datetime.to_string(self.expires_at),
+            'bus_channel': self.sudo().bus_channel,
+        }
+
+    @api.model
+    def _midtrans_get_charge_by_order_id(self, order_id):
+        """Cari charge dari order id Midtrans, lewat primary key yang ada di suffix order id"""
+        charge_id = order_id.rpartition('-')[2]
+        if not charge_id.isdigit():
+            return self.browse()
+        charge = self.browse(int(charge_id)).exists()
+        return charge if charge.order_id == order_id else self.browse()
+
+    @api.model
+    def _midtrans_handle_notification(self, notification_data):
+        """Verifikasi dan terapkan notifikasi Midtrans untuk charge POS, lalu push ke POS.
+
+        :param dict notification_data: payload notifikasi dari Midtrans
+        :return: charge yang diproses
+        :raise ValidationError: jika charge tidak ditemukan atau signature tidak valid
+        """
+        order_id = notification_data.get('order_id')
+        charge = self._midtrans_get_charge_by_order_id(order_id)
+        if not charge:
+            raise ValidationError(
+                "Midtrans: " + _("No POS charge found matching order_id: %s", order_id)
+            )
+        if not charge.provider_id._midtrans_verify_signature(notification_data):
+            raise ValidationError("Midtrans: " + _("Invalid signature for order %s", order_id))
+
+        target_state = self.env['payment.transaction']._midtrans_get_target_state(notification_data)
+        if not target_state or const.STATE_RANK[target_state] <= const.STATE_RANK.get(charge.state, 0):
+            return charge
+
+        charge.write({
+            'state': target_state,
+            'midtrans_transaction_id': notification_data.get('transaction_id') or charge.midtrans_transaction_id,
+        })
+        charge._midtrans_notify_pos()
+        return charge
+
+    def _midtrans_notify_pos(self):
+        """Kirim status charge ke POS yang menunggu lewat bus, tanpa polling"""
+        self.env['bus.bus']._sendmany([
+            (charge.sudo().bus_channel, const.POS_BUS_NOTIFICATION, {
+                'order_id': charge.order_id,
+                'state': charge.state,
+                'transaction_id': charge.midtrans_transaction_id,
+            })
+            for charge in self
+        ])
+
+    def _midtrans_cancel(self):
+        """Batalkan charge yang masih pending di Midtrans (mis. kasir membatalkan pembayaran)"""
+        for charge in self.filtered(lambda c: c.state == 'pending'):
+            try:
+                charge.provider_id._midtrans_make_request(f'/{charge.order_id}/cancel')
+            except (requests.exceptions.RequestException, ValueError):
+                _logger.warning("Midtrans: unable to cancel QRIS charge %s", charge.order_id, exc_info=True)
+                continue
+            charge.state = 'cancel'
@@ -0,0 +1,418 @@
+import csv
+import io
+import json
+import logging
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from odoo import _, api, fields, models
+from odoo.exceptions import UserError
+from odoo.tools import float_compare
+
+from odoo.addons.payment_midtrans import const
+
+_logger = logging.getLogger(__name__)
+
+
+class PaymentMidtransSettlement(models.Model):
+    _name = 'payment.midtrans.settlement'
+    _description = 'Midtrans Settlement Import'
+    _order = 'id desc'
+
+    name = fields.Char(string='File Name', required=True)
+    provider_id = fields.Many2one(
+        'payment.provider', string='Provider', required=True,
+        domain=[('code', '=', 'midtrans')], ondelete='restrict'
+    )
+    company_id = fields.Many2one(related='provider_id.company_id', store=True)
+    currency_id = fields.Many2one(related='company_id.currency_id')
+    file = fields.Binary(string='Settlement File', required=True, attachment=True)
+    state = fields.Selection(
+        [
+            ('draft', 'Draft'),
+            ('queued', 'Queued'),
+            ('done', 'Done'),
+            ('error', 'Error'),
+        ],
+        string='Status',
+        default='draft',
+        required=True,
+    )
+    rows_processed = fields.Integer(string='Rows Processed', readonly=True)
+    rows_matched = fields.Integer(string='Rows Matched', readonly=True)
+    rows_flagged = fields.Integer(string='Rows Flagged', readonly=True)
+    amount_gross = fields.Monetary(string='Gross Amount', readonly=True)
+    amount_fee = fields.Monetary(string='Fee', readonly=True)
+    amount_refund = fields.Monetary(string='Refunds', readonly=True)
+    amount_net = fields.Monetary(string='Net Amount', readonly=True)
+    line_ids = fields.One2many(
+        'payment.midtrans.settlement.line', 'settlement_id', string='Flagged Rows', readonly=True
+    )
+    move_ids = fields.Many2many('account.move', string='Journal Entries', readonly=True, copy=False)
+    last_error = fields.Text(string='Last Error', readonly=True)
+
+    def action_import(self):
+        """Antrikan file untuk diproses cron di background, commit per batch"""
+        for settlement in self:
+            provider = settlement.provider_id
+            if not provider.midtrans_settlement_journal_id or not provider.midtrans_fee_account_id:
+                raise UserError(_(
+                    "Configure the settlement journal and fee account on provider %s first.",
+                    provider.name
+                ))
+        self.write({'state': 'queued', 'last_error': False})
+        self.env.ref('payment_midtrans.ir_cron_midtrans_import_settlements')._trigger()
+
+    def action_view_moves(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _("Settlement Entries"),
+            'res_model': 'account.move',
+            'view_mode': 'tree,form',
+            'domain': [('id', 'in', self.move_ids.ids)],
+        }
+
+    @api.model
+    def _cron_import_settlements(self):
+        for settlement in self.search([('state', '=', 'queued')], order='id'):
+            try:
+                settlement._import_file()
+            except Exception as e:
+                self.env.cr.rollback()
+                _logger.exception("Midtrans: settlement import %s failed", settlement.id)
+                settlement.write({'state': 'error', 'last_error': str(e)})
+            else:
+                settlement.state = 'done'
+            self.env.cr.commit()
+
+    def _import_file(self):
+        """Stream file settlement dan proses per batch dengan memori terbatas.
+
+        Setiap batch di-commit beserta `rows_processed`, sehingga import yang terhenti
+        dilanjutkan dari baris terakhir yang sudah di-commit.
+        """
+        self.ensure_one()
+        batch_size = int(self.env['ir.config_parameter'].sudo().get_param(
+            const.SETTLEMENT_BATCH_SIZE_PARAM, const.SETTLEMENT_BATCH_SIZE
+        ))
+        skip = self.rows_processed
+        batch = []
+        with self._open_file() as stream:
+            for row in self._iter_rows(stream):
+                if skip:
+                    skip -= 1
+                    continue
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    self._process_batch(batch)
+                    self.env.cr.commit()
+                    batch = []
+            if batch:
+                self._process_batch(batch)
+
+    def _open_file(self):
+        """Buka attachment sebagai stream biner tanpa memuat isinya ke memori bila memungkinkan"""
+        attachment = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_id', '=', self.id),
+            ('res_field', '=', 'file'),
+        ], limit=1)
+        if attachment.store_fname:
+            return open(attachment._full_path(attachment.store_fname), 'rb')
+        return io.BytesIO(attachment.raw or b'')
+
+    @api.model
+    def _iter_rows(self, stream):
+        """Iterasi baris settlement sebagai dict dengan key yang dinormalisasi.
+
+        Mendukung CSV (dengan header), JSON Lines, dan array JSON.
+        """
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        first_char = ''
+        while not first_char:
+            first_char = text.read(1)
+            if not first_char:
+                return
+            if first_char.isspace():
+                first_char = ''
+        if first_char == '[':
+            rows = self._iter_json_array(text)
+        elif first_char == '{':
+            rows = (json.loads(line) for line in self._prepend(first_char, text) if line.strip())
+        else:
+            rows = csv.DictReader(self._prepend(first_char, text))
+        for row in rows:
+            yield {self._normalize_key(key): value for key, value in row.items() if key}
+
+    @staticmethod
+    def _prepend(first_char, text):
+        first_line = first_char + text.readline()
+        yield first_line
+        yield from text
+
+    @staticmethod
+    def _iter_json_array(text, chunk_size=1 << 16):
+        """Decode elemen array JSON satu per satu dari stream (setelah '[')"""
+        decoder = json.JSONDecoder()
+        buffer = ''
+        eof = False
+        while True:
+            buffer = buffer.lstrip().lstrip(',').lstrip()
+            if buffer.startswith(']'):
+                return
+            try:
+                row, end = decoder.raw_decode(buffer)
+            except ValueError:
+                if eof:
+                    if buffer.strip():
+                        raise UserError(_("Invalid JSON settlement file."))
+                    return
+                chunk = text.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield row
+            buffer = buffer[end:]
+
+    @staticmethod
+    def _normalize_key(key):
+        key = key.strip().lower().replace(' ', '_')
+        return const.SETTLEMENT_COLUMN_ALIASES.get(key, key)
+
+    @staticmethod
+    def _parse_amount(value, default=None):
+        """Parse angka dari laporan; None jika tidak bisa dibaca (mis. 'Rp 1.000')"""
+        if value in (None, ''):
+            return default
+        if isinstance(value, (int, float)):
+            return float(value)
+        try:
+            return float(Decimal(str(value).replace(',', '').strip()))
+        except InvalidOperation:
+            return None
+
+    def _process_batch(self, rows):
+        """Cocokkan satu batch baris ke transaksi, tandai selisih, dan buat jurnal"""
+        order_ids = {row.get('order_id') for row in rows if row.get('order_id')}
+        transaction_ids = {row.get('transaction_id') for row in rows if row.get('transaction_id')}
+        txs = self.env['payment.transaction'].sudo().search_fetch([
+            ('provider_code', '=', 'midtrans'),
+            '|',
+            ('midtrans_order_id', 'in', list(order_ids)),
+            ('midtrans_transaction_id', 'in', list(transaction_ids)),
+        ], ['midtrans_order_id', 'midtrans_transaction_id', 'amount', 'state', 'midtrans_settlement_id'])
+        by_order_id = {tx.midtrans_order_id: tx for tx in txs}
+        by_transaction_id = {tx.midtrans_transaction_id: tx for tx in txs if tx.midtrans_transaction_id}
+
+        rounding = self.currency_id.rounding
+        flagged_vals = []
+        matched_ids = []
+        gross_by_tx_id = {}
+        refund_count = 0
+        gross_total = fee_total = refund_total = net_total = 0.0
+        for row in rows:
+            tx = by_order_id.get(row.get('order_id')) or by_transaction_id.get(row.get('transaction_id'))
+            is_refund = (row.get('transaction_status') or '').lower() in const.SETTLEMENT_REFUND_STATUSES
+            gross = self._parse_amount(row.get('gross_amount'))
+            fee = self._parse_amount(row.get('fee'), default=0.0)
+            net = self._parse_amount(row.get('net_amount'), default=0.0)
+            if gross is None or fee is None or net is None:
+                reason = 'unparseable'
+            elif is_refund:
+                reason = self._get_refund_mismatch_reason(tx)
+            else:
+                reason = self._get_mismatch_reason(tx, row, gross, rounding, gross_by_tx_id)
+            if reason:
+                flagged_vals.append({
+                    'settlement_id': self.id,
+                    'transaction_id': tx.id if tx else False,
+                    'order_id': row.get('order_id'),
+                    'midtrans_transaction_id': row.get('transaction_id'),
+                    'reason': reason,
+                    'settled_amount': gross or 0.0,
+                    'settled_status': row.get('transaction_status'),
+                })
+                continue
+            if is_refund:
+                # Refund keluar dari saldo Midtrans: tanda di laporan bisa positif atau negatif
+                refund_count += 1
+                fee_total += abs(fee)
+                refund_total += abs(gross)
+                net_total -= abs(gross) + abs(fee)
+                continue
+            matched_ids.append(tx.id)
+            gross_by_tx_id[tx.id] = gross
+            gross_total += gross
+            fee_total += fee
+            net_total += net if row.get('net_amount') else gross - fee
+
+        if flagged_vals:
+            self.env['payment.midtrans.settlement.line'].create(flagged_vals)
+        matched = self.env['payment.transaction'].browse(matched_ids)
+        if matched or refund_count:
+            self._mark_settled(matched)
+            move = self._create_move(gross_by_tx_id, fee_total, refund_total, net_total)
+            self.move_ids = [fields.Command.link(move.id)]
+        self.write({
+            'rows_processed': self.rows_processed + len(rows),
+            'rows_matched': self.rows_matched + len(matched) + refund_count,
+            'rows_flagged': self.rows_flagged + len(flagged_vals),
+            'amount_gross': self.amount_gross + gross_total,
+            'amount_fee': self.amount_fee + fee_total,
+            'amount_refund': self.amount_refund + refund_total,
+            'amount_net': self.amount_net + net_total,
+        })
+        _logger.info(
+            "Midtrans settlement %s: %s rows processed, %s matched, %s flagged",
+            self.id, self.rows_processed, self.rows_matched, self.rows_flagged
+        )
+
+    def _get_mismatch_reason(self, tx, row, gross, rounding, gross_by_tx_id):
+        if not tx:
+            return 'missing'
+        if tx.midtrans_settlement_id or tx.id in gross_by_tx_id:
+            return 'duplicate'
+        if float_compare(tx.amount, gross, precision_rounding=rounding):
+            return 'amount'
+        expected_state = const.SETTLEMENT_STATUS_STATES.get(
+            (row.get('transaction_status') or 'settlement').lower(), 'done'
+        )
+        if tx.state != expected_state:
+            return 'status'
+        return None
+
+    def _get_refund_mismatch_reason(self, tx):
+        """Refund hanya valid untuk transaksi yang sudah dibayar"""
+        if not tx:
+            return 'missing'
+        if tx.state != 'done':
+            return 'status'
+        return None
+
+    def _mark_settled(self, txs):
+        """Tandai transaksi sebagai sudah di-settle dalam satu UPDATE"""
+        if not txs:
+            return
+        txs.flush_recordset(['midtrans_settlement_id'])
+        self.env.cr.execute("""
+            UPDATE payment_transaction
+               SET midtrans_settlement_id = %s
+             WHERE id = ANY(%s)
+        """, [self.id, txs.ids])
+        txs.invalidate_recordset(['midtrans_settlement_id'])
+
+    def _create_move(self, gross_by_tx_id, fee, refund, net):
+        """Satu jurnal per batch: outstanding receipts (gross) -> bank (net) + biaya (fee) + refund
+
+        Baris outstanding receipts dibuat per akun outstanding payment transaksi, lalu
+        direkonsiliasi dengan baris payment transaksi yang cocok sehingga tidak perlu
+        rekonsiliasi manual.
+
+        :param dict gross_by_tx_id: {id transaksi yang cocok: gross amount}
+        """
+        provider = self.provider_id
+        journal = provider.midtrans_settlement_journal_id
+        default_outstanding_account = (
+            provider.journal_id.inbound_payment_method_line_ids[:1].payment_account_id
+            or self.company_id.account_journal_payment_debit_account_id
+        )
+        txs = self.env['payment.transaction'].browse(list(gross_by_tx_id))
+        txs_by_account = defaultdict(lambda: self.env['payment.transaction'])
+        for tx in txs:
+            txs_by_account[tx.payment_id.outstanding_account_id or default_outstanding_account] |= tx
+
+        count = len(txs)
+        label = _("Midtrans settlement %(file)s (%(count)s transactions)", file=self.name, count=count)
+        lines = [
+            fields.Command.create({
+                'name': label,
+                'account_id': journal.default_account_id.id,
+                'debit' if net >= 0 else 'credit': abs(net),
+            }),
+        ]
+        for account, account_txs in txs_by_account.items():
+            lines.append(fields.Command.create({
+                'name': label,
+                'account_id': account.id,
+                'credit': sum(gross_by_tx_id[tx.id] for tx in account_txs),
+            }))
+        if fee:
+            lines.append(fields.Command.create({
+                'name': _("Midtrans fees"),
+                'account_id': provider.midtrans_fee_account_id.id,
+                'debit': fee,
+            }))
+        if refund:
+            lines.append(fields.Command.create({
+                'name': _("Midtrans refunds"),
+                'account_id': (
+                    provider.journal_id.outbound_payment_method_line_ids[:1].payment_account_id
+                    or self.company_id.account_journal_payment_credit_account_id
+                ).id,
+                'debit': refund,
+            }))
+        gross = sum(gross_by_tx_id.values())
+        diff = self.currency_id.round(gross - net - fee - refund)
+        if diff:
+            # Selisih pembulatan antara gross, fee dan net dari laporan
+            lines.append(fields.Command.create({
+                'name': _("Midtrans settlement difference"),
+                'account_id': provider.midtrans_fee_account_id.id,
+                'debit' if diff > 0 else 'credit': abs(diff),
+            }))
+        move = self.env['account.move'].create({
+            'move_type': 'entry',
+            'journal_id': journal.id,
+            'ref': label,
+            'line_ids': lines,
+        })
+        move.action_post()
+        self._reconcile_payments(move, txs_by_account)
+        return move
+
+    def _reconcile_payments(self, move, txs_by_account):
+        """Rekonsiliasi baris outstanding receipts jurnal settlement dengan payment transaksi"""
+        for account, txs in txs_by_account.items():
+            if not account.reconcile:
+                continue
+            payment_lines = txs.payment_id.move_id.line_ids.filtered(
+                lambda line: line.account_id == account and not line.reconciled
+            )
+            settlement_lines = move.line_ids.filtered(
+                lambda line: line.account_id == account and line.credit
+            )
+            if payment_lines:
+                (settlement_lines + payment_lines).reconcile()
+
+
+class PaymentMidtransSettlementLine(models.Model):
+    _name = 'payment.midtrans.settlement.line'
+    _description = 'Midtrans Settlement Flagged Row'
+    _order = 'id'
+
+    settlement_id = fields.Many2one(
+        'payment.midtrans.settlement', string='Settlement', required=True,
+        ondelete='cascade', index=True
+    )
+    transaction_id = fields.Many2one('payment.transaction', string='Transaction', ondelete='set null')
+    order_id = fields.Char(string='Midtrans Order ID')
+    midtrans_transaction_id = fields.Char(string='Midtrans Transaction ID')
+    reason = fields.Selection(
+        [
+            ('missing', 'No Matching Transaction'),
+            ('amount', 'Amount Mismatch'),
+            ('status', 'Status Mismatch'),
+            ('duplicate', 'Already Settled'),
+            ('unparseable', 'Unparseable Amount'),
+        ],
+        string='Reason',
+        required=True,
+    )
+    settled_amount = fields.Float(string='Settled Amount')
+    settled_status = fields.Char(string='Settled Status')
+    transaction_amount = fields.Monetary(
+        related='transaction_id.amount', currency_field='transaction_currency_id'
+    )
+    transaction_currency_id = fields.Many2one(related='transaction_id.currency_id')
+    transaction_state = fields.Selection(related='transaction_id.state')
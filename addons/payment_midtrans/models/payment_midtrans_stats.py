@@ -0,0 +1,151 @@
+from collections import defaultdict
+
+from odoo import api, fields, models
+
+
+class PaymentMidtransStats(models.Model):
+    """Agregat transaksi Midtrans per jam, provider dan metode pembayaran.
+
+    Baris di-update secara incremental (UPSERT) setiap kali notifikasi mengubah state
+    transaksi, sehingga dashboard cukup membaca tabel kecil ini dan tidak perlu
+    read_group atas seluruh histori `payment.transaction`.
+    """
+    _name = 'payment.midtrans.stats'
+    _description = 'Midtrans Hourly Statistics'
+    _order = 'hour desc, provider_id, payment_type'
+
+    hour = fields.Datetime(string='Hour', required=True, readonly=True, index=True)
+    provider_id = fields.Many2one(
+        'payment.provider', string='Provider', required=True, readonly=True, ondelete='cascade'
+    )
+    company_id = fields.Many2one(related='provider_id.company_id')
+    currency_id = fields.Many2one(related='provider_id.company_id.currency_id')
+    payment_type = fields.Char(string='Payment Method', required=True, readonly=True)
+    tx_count = fields.Integer(string='Transactions', readonly=True)
+    done_count = fields.Integer(string='Paid', readonly=True)
+    cancel_count = fields.Integer(string='Cancelled', readonly=True)
+    error_count = fields.Integer(string='Errors', readonly=True)
+    done_amount = fields.Monetary(string='Paid Volume', readonly=True)
+    success_rate = fields.Float(
+        string='Success Rate (%)', compute='_compute_success_rate', group_operator=False
+    )
+
+    _sql_constraints = [
+        (
+            'hour_provider_payment_type_uniq',
+            'unique(hour, provider_id, payment_type)',
+            'Only one statistics row per hour, provider and payment method.',
+        ),
+    ]
+
+    @api.depends('done_count', 'cancel_count', 'error_count')
+    def _compute_success_rate(self):
+        for stats in self:
+            final_count = stats.done_count + stats.cancel_count + stats.error_count
+            stats.success_rate = final_count and 100.0 * stats.done_count / final_count
+
+    @api.model
+    def _record_transitions(self, txs, previous_states):
+        """Tambahkan perubahan state transaksi ke agregat dalam satu UPSERT.
+
+        Semua counter satu transaksi selalu berada di bucket metode pembayaran terakhirnya,
+        sama seperti `_rebuild_stats`: kontribusi state sebelumnya dikeluarkan dari bucket
+        lama dan kontribusi state baru dimasukkan ke bucket metode pembayaran saat ini.
+
+        :param recordset txs: transaksi `payment.transaction` yang baru saja diubah state-nya
+        :param dict previous_states: {tx id: state sebelum perubahan}
+        """
+        deltas = defaultdict(lambda: [0, 0, 0, 0, 0.0])
+        txs_by_payment_type = defaultdict(lambda: self.env['payment.transaction'])
+        # Refund (child transaction, amount negatif) bukan pembayaran; sama dengan `_rebuild_stats`
+        for tx in txs.filtered(lambda tx: tx.operation != 'refund'):
+            previous_state = previous_states.get(tx.id)
+            payment_type = tx.midtrans_payment_type or 'unknown'
+            previous_payment_type = tx.midtrans_stats_payment_type or payment_type
+            if tx.state == previous_state and payment_type == previous_payment_type:
+                continue
+            hour = tx.create_date.replace(minute=0, second=0, microsecond=0)
+            previous_delta = deltas[(hour, tx.provider_id.id, previous_payment_type)]
+            for index, value in enumerate(self._get_contribution(tx, previous_state)):
+                previous_delta[index] -= value
+            delta = deltas[(hour, tx.provider_id.id, payment_type)]
+            for index, value in enumerate(self._get_contribution(tx, tx.state)):
+                delta[index] += value
+            if tx.midtrans_stats_payment_type != payment_type:
+                txs_by_payment_type[payment_type] |= tx
+        for payment_type, payment_type_txs in txs_by_payment_type.items():
+            payment_type_txs.write({'midtrans_stats_payment_type': payment_type})
+        deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+        if deltas:
+            self._upsert(deltas)
+
+    @staticmethod
+    def _get_contribution(tx, state):
+        """Nilai counter satu transaksi pada `state`: [tx, done, cancel, error, amount]"""
+        return [
+            int(state not in (None, 'draft')),
+            int(state == 'done'),
+            int(state == 'cancel'),
+            int(state == 'error'),
+            tx.amount if state == 'done' else 0.0,
+        ]
+
+    def _upsert(self, deltas):
+        """:param dict deltas: {(hour, provider id, payment type): [tx, done, cancel, error, amount]}"""
+        rows = [key + tuple(delta) for key, delta in deltas.items()]
+        self.env.cr.execute("""
+            INSERT INTO payment_midtrans_stats AS stats (
+                hour, provider_id, payment_type,
+                tx_count, done_count, cancel_count, error_count, done_amount,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT v.*, %s, NOW() AT TIME ZONE 'UTC', %s, NOW() AT TIME ZONE 'UTC'
+              FROM unnest(
+                    %s::timestamp[], %s::int[], %s::varchar[],
+                    %s::int[], %s::int[], %s::int[], %s::int[], %s::numeric[]
+                   ) AS v
+            ON CONFLICT (hour, provider_id, payment_type) DO UPDATE
+               SET tx_count = stats.tx_count + EXCLUDED.tx_count,
+                   done_count = stats.done_count + EXCLUDED.done_count,
+                   cancel_count = stats.cancel_count + EXCLUDED.cancel_count,
+                   error_count = stats.error_count + EXCLUDED.error_count,
+                   done_amount = stats.done_amount + EXCLUDED.done_amount,
+                   write_date = EXCLUDED.write_date
+        """, [self.env.uid, self.env.uid] + [list(column) for column in zip(*rows)])
+        self.invalidate_model()
+
+    @api.model
+    def _rebuild_stats(self):
+        """Hitung ulang seluruh agregat dari histori transaksi (sekali, saat upgrade)"""
+        self.env['payment.transaction'].flush_model()
+        self.env.cr.execute("DELETE FROM payment_midtrans_stats")
+        self.env.cr.execute("""
+            INSERT INTO payment_midtrans_stats (
+                hour, provider_id, payment_type,
+                tx_count, done_count, cancel_count, error_count, done_amount,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT date_trunc('hour', tx.create_date),
+                   tx.provider_id,
+                   COALESCE(tx.midtrans_payment_type, 'unknown'),
+                   COUNT(*) FILTER (WHERE tx.state != 'draft'),
+                   COUNT(*) FILTER (WHERE tx.state = 'done'),
+                   COUNT(*) FILTER (WHERE tx.state = 'cancel'),
+                   COUNT(*) FILTER (WHERE tx.state = 'error'),
+                   COALESCE(SUM(tx.amount) FILTER (WHERE tx.state = 'done'), 0),
+                   %s, NOW() AT TIME ZONE 'UTC', %s, NOW() AT TIME ZONE 'UTC'
+              FROM payment_transaction tx
+              JOIN payment_provider provider ON provider.id = tx.provider_id
+             WHERE provider.code = 'midtrans'
+               AND tx.operation IS DISTINCT FROM 'refund'
+             GROUP BY 1, 2, 3
+        """, [self.env.uid, self.env.uid])
+        self.env.cr.execute("""
+            UPDATE payment_transaction tx
+               SET midtrans_stats_payment_type = COALESCE(tx.midtrans_payment_type, 'unknown')
+              FROM payment_provider provider
+             WHERE provider.id = tx.provider_id
+               AND provider.code = 'midtrans'
+        """)
+        self.env['payment.transaction'].invalidate_model(['midtrans_stats_payment_type'])
+        self.invalidate_model()
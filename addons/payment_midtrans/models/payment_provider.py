@@ -1,7 +1,12 @@
+import base64
+import hashlib
+import hmac
 import logging
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import ValidationError
 
+from odoo.addons.payment_midtrans import const, midtrans_client, utils as midtrans_utils
+
 _logger = logging.getLogger(__name__)
 
 
@@ -52,6 +57,41 @@ class PaymentProvider(models.Model):
         help='Snap untuk popup payment, Core API untuk custom integration'
     )
 
+    midtrans_notification_mode = fields.Selection(
+        [
+            ('sync', 'Synchronous'),
+            ('async', 'Asynchronous (Inbox)'),
+        ],
+        string='Notification Processing',
+        default='sync',
+        help='Synchronous memproses notifikasi di dalam request webhook. '
+             'Asynchronous hanya memverifikasi signature, menyimpan notifikasi ke inbox, '
+             'lalu memprosesnya secara batch di background.'
+    )
+    midtrans_settlement_journal_id = fields.Many2one(
+        'account.journal',
+        string='Settlement Journal',
+        domain=[('type', '=', 'bank')],
+        help='Journal bank penerima payout Midtrans, dipakai saat import laporan settlement'
+    )
+    midtrans_fee_account_id = fields.Many2one(
+        'account.account',
+        string='Midtrans Fee Account',
+        help='Akun biaya untuk fee/MDR Midtrans dari laporan settlement'
+    )
+    # State circuit breaker yang dibagi antar worker process; ditulis lewat SQL langsung
+    midtrans_circuit_open_until = fields.Datetime(
+        string='Circuit Open Until',
+        readonly=True,
+        copy=False,
+        help='Selama waktu ini call ke Midtrans ditolak (fail fast) karena error/latency tinggi'
+    )
+    midtrans_circuit_probe_at = fields.Datetime(
+        string='Circuit Probe At',
+        readonly=True,
+        copy=False,
+    )
+
     def _get_midtrans_api_url(self):
         """Get Midtrans API endpoint URL"""
         self.ensure_one()
@@ -59,19 +99,22 @@ class PaymentProvider(models.Model):
             return 'https://api.midtrans.com/v2'
         return 'https://api.sandbox.midtrans.com/v2'
     
+    def _get_midtrans_snap_origin(self):
+        """Get Midtrans Snap origin, dipakai juga untuk preconnect hint di checkout"""
+        self.ensure_one()
+        if self.midtrans_environment == 'production':
+            return 'https://app.midtrans.com'
+        return 'https://app.sandbox.midtrans.com'
+
     def _get_midtrans_snap_url(self):
         """Get Midtrans Snap JS URL"""
         self.ensure_one()
-        if self.midtrans_environment == 'production':
-            return 'https://app.midtrans.com/snap/snap.js'
-        return 'https://app.sandbox.midtrans.com/snap/snap.js'
+        return f'{self._get_midtrans_snap_origin()}/snap/snap.js'
     
     def _get_midtrans_snap_redirect_url(self):
         """Get Midtrans Snap redirect URL"""
         self.ensure_one()
-        if self.midtrans_environment == 'production':
-            return 'https://app.midtrans.com/snap/v2/vtweb/'
-        return 'https://app.sandbox.midtrans.com/snap/v2/vtweb/'
+        return f'{self._get_midtrans_snap_origin()}/snap/v2/vtweb/'
 
     @api.model
     def _get_compatible_providers(self, *args, currency_id=None, **kwargs):
@@ -82,6 +125,81 @@ class PaymentProvider(models.Model):
     def _midtrans_get_api_url(self):
         """Get API URL (alias for compatibility)"""
         return self._get_midtrans_api_url()
+
+    def write(self, vals):
+        res = super().write(vals)
+        if any(provider.code == 'midtrans' for provider in self):
+            # Credentials/environment bisa berubah; buang cache konfigurasi Midtrans
+            self.env.registry.clear_cache()
+        return res
+
+    @tools.ormcache('self.id')
+    def _midtrans_get_config(self):
+        """Get cached credentials, auth header and endpoint URLs of the provider
+
+        Dipakai di hot path (webhook, status check) agar tidak ada read ORM tambahan.
+        Cache dibuang setiap kali record provider di-write.
+
+        :rtype: MidtransConfig
+        """
+        self.ensure_one()
+        provider = self.sudo()
+        server_key = provider.midtrans_server_key or ''
+        auth_string = base64.b64encode(f"{server_key}:".encode()).decode()
+        # Override API URL, mis. untuk simulator lokal (tools/midtrans_bench)
+        api_url_override = self.env['ir.config_parameter'].sudo().get_param(
+            const.API_URL_OVERRIDE_PARAM
+        )
+        return midtrans_utils.MidtransConfig(
+            server_key=server_key,
+            auth_header=f'Basic {auth_string}',
+            api_url=api_url_override or provider._get_midtrans_api_url(),
+            snap_url=provider._get_midtrans_snap_url(),
+            snap_redirect_url=provider._get_midtrans_snap_redirect_url(),
+            notification_mode=provider.midtrans_notification_mode,
+        )
+
+    def _midtrans_verify_signature(self, notification_data):
+        """Verify the signature_key of a Midtrans notification
+
+        Signature = sha512(order_id + status_code + gross_amount + server_key), dibandingkan
+        dengan constant-time comparison.
+
+        :param dict notification_data: payload notifikasi dari Midtrans
+        :return: True jika signature valid
+        :rtype: bool
+        """
+        self.ensure_one()
+        server_key = self._midtrans_get_config().server_key
+        signature_string = '{}{}{}{}'.format(
+            notification_data.get('order_id'),
+            notification_data.get('status_code'),
+            notification_data.get('gross_amount'),
+            server_key,
+        )
+        calculated_signature = hashlib.sha512(signature_string.encode()).hexdigest()
+        return hmac.compare_digest(calculated_signature, str(notification_data.get('signature_key', '')))
+
+    def _midtrans_get_client(self):
+        """Get shared Midtrans HTTP client (connection pool) for this provider"""
+        self.ensure_one()
+        config = self._midtrans_get_config()
+        return midtrans_client.get_client(
+            self.env.cr.dbname, self.id, config.api_url, config.auth_header
+        )
+
+    def _midtrans_make_request(self, endpoint, payload=None, method='POST'):
+        """Make a request to Midtrans API using the pooled client
+
+        :param str endpoint: endpoint relatif terhadap API URL, mis. '/{order_id}/status'
+        :param dict payload: body JSON untuk request
+        :param str method: HTTP method
+        :return: response JSON dari Midtrans
+        :rtype: dict
+        :raise CircuitOpenError: jika circuit breaker sedang terbuka (fail fast)
+        :raise requests.exceptions.RequestException: jika request gagal
+        """
+        return self._midtrans_get_client().request(method, endpoint, payload=payload)
     
     @api.constrains('midtrans_server_key', 'midtrans_client_key', 'midtrans_merchant_id', 'state')
     def _check_midtrans_credentials(self):
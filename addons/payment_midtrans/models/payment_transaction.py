@@ -1,13 +1,19 @@
+import hashlib
 import logging
+import psycopg2.errors
 import requests
-import json
-import base64
-import hashlib
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from werkzeug import urls
 
 from odoo import _, api, fields, models
-from odoo.exceptions import ValidationError
+from odoo.exceptions import AccessError, ValidationError
+from odoo.tools import str2bool
 from odoo.addons.payment import utils as payment_utils
+from odoo.addons.payment_midtrans import const, metrics, utils as midtrans_utils
+from odoo.addons.payment_midtrans.circuit_breaker import CircuitOpenError
 
 _logger = logging.getLogger(__name__)
 
@@ -18,14 +24,99 @@ class PaymentTransaction(models.Model):
     midtrans_order_id = fields.Char(
         string='Midtrans Order ID',
         readonly=True,
+        copy=False,
         help='Unique order ID yang digenerate untuk Midtrans'
     )
     
     midtrans_transaction_id = fields.Char(
         string='Midtrans Transaction ID',
         readonly=True,
+        index='btree_not_null',
         help='Transaction ID dari Midtrans setelah pembayaran diproses'
     )
+    midtrans_payment_type = fields.Char(
+        string='Midtrans Payment Type',
+        readonly=True,
+        copy=False,
+        help='Metode pembayaran yang dipakai customer (mis. gopay, qris, bank_transfer)'
+    )
+    midtrans_stats_payment_type = fields.Char(
+        string='Midtrans Statistics Payment Type',
+        readonly=True,
+        copy=False,
+        help='Metode pembayaran tempat transaksi ini terakhir dihitung di statistik dashboard'
+    )
+    midtrans_settlement_id = fields.Many2one(
+        'payment.midtrans.settlement',
+        string='Midtrans Settlement',
+        readonly=True,
+        copy=False,
+        index='btree_not_null',
+        help='Import laporan settlement yang sudah merekonsiliasi transaksi ini'
+    )
+
+    midtrans_notification_fingerprint = fields.Char(
+        string='Midtrans Notification Fingerprint',
+        readonly=True,
+        copy=False,
+        help='Fingerprint notifikasi terakhir yang diproses, untuk deduplikasi'
+    )
+
+    midtrans_status_check_requested = fields.Boolean(
+        string='Midtrans Status Check Requested',
+        readonly=True,
+        copy=False,
+        help='Status transaksi perlu diverifikasi ke Midtrans oleh cron di background'
+    )
+    midtrans_snap_token = fields.Char(
+        string='Midtrans Snap Token',
+        readonly=True,
+        copy=False,
+        groups='base.group_system',
+    )
+    midtrans_snap_redirect_url = fields.Char(
+        string='Midtrans Snap Redirect URL',
+        readonly=True,
+        copy=False,
+        groups='base.group_system',
+    )
+    midtrans_snap_token_expiry = fields.Datetime(
+        string='Midtrans Snap Token Expiry',
+        readonly=True,
+        copy=False,
+        groups='base.group_system',
+    )
+    midtrans_expires_at = fields.Datetime(
+        string='Midtrans Expires At',
+        readonly=True,
+        copy=False,
+        index='btree_not_null',
+        help='Batas waktu pembayaran Snap; transaksi yang belum dibayar dibatalkan setelahnya'
+    )
+    midtrans_snap_cache_key = fields.Char(
+        string='Midtrans Snap Cache Key',
+        readonly=True,
+        copy=False,
+        groups='base.group_system',
+        help='Hash dari amount, currency dan order lines saat Snap token dibuat'
+    )
+
+    _sql_constraints = [
+        (
+            'midtrans_order_id_uniq',
+            'unique(midtrans_order_id)',
+            'Midtrans Order ID harus unik.',
+        ),
+    ]
+
+    def init(self):
+        super().init()
+        # Partial index untuk cron verifikasi; hanya segelintir baris yang bernilai True
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS payment_transaction_midtrans_status_check_requested_idx
+                ON payment_transaction (id)
+             WHERE midtrans_status_check_requested
+        """)
 
     def _get_specific_rendering_values(self, processing_values):
         res = super()._get_specific_rendering_values(processing_values)
@@ -34,12 +125,13 @@ class PaymentTransaction(models.Model):
             return res
 
         base_url = self.provider_id.get_base_url()
+        config = self.provider_id._midtrans_get_config()
         
         midtrans_order_id = f"{self.reference}-{self.id}"
         
         rendering_values = {
-            'api_url': self.provider_id._get_midtrans_api_url(),
-            'snap_url': self.provider_id._get_midtrans_snap_url(),
+            'api_url': config.api_url,
+            'snap_url': config.snap_url,
             'client_key': self.provider_id.midtrans_client_key,
             'order_id': midtrans_order_id,
             'amount': int(self.amount),  # Midtrans butuh integer (dalam cent/smallest unit)
@@ -63,10 +155,7 @@ class PaymentTransaction(models.Model):
                 "Midtrans: " + _("Received notification with missing order_id")
             )
 
-        tx = self.search([
-            ('midtrans_order_id', '=', order_id),
-            ('provider_code', '=', 'midtrans')
-        ])
+        tx = self._midtrans_get_tx_by_order_id(order_id)
         
         if not tx:
             raise ValidationError(
@@ -75,121 +164,501 @@ class PaymentTransaction(models.Model):
         
         return tx
 
+    @api.model
+    def _midtrans_get_tx_by_order_id(self, order_id):
+        """Find the Midtrans transaction matching an order id.
+
+        Order id dibuat sebagai `{reference}-{id}`, sehingga id transaksi bisa
+        langsung di-decode dari suffix-nya dan dibaca lewat primary key. Search
+        pada `midtrans_order_id` hanya dipakai sebagai fallback.
+
+        :param str order_id: order id dari Midtrans
+        :return: transaksi yang cocok, atau recordset kosong
+        :rtype: recordset of `payment.transaction`
+        """
+        _reference, _sep, tx_id = order_id.rpartition('-')
+        if tx_id.isdigit():
+            tx = self.browse(int(tx_id)).exists()
+            if tx and tx.midtrans_order_id == order_id and tx.provider_code == 'midtrans':
+                return tx
+
+        return self.search([
+            ('midtrans_order_id', '=', order_id),
+            ('provider_code', '=', 'midtrans')
+        ], limit=1)
+
+    def _handle_notification_data(self, provider_code, notification_data):
+        """Override of `payment` to skip duplicate and stale Midtrans notifications.
+
+        Notifikasi yang sama bisa datang dari webhook, `/success` dan `/return`, dan
+        Midtrans juga melakukan retry. Notifikasi dengan fingerprint yang sama, atau
+        yang tidak memajukan state transaksi, di-skip sebelum ada write ke ORM. Jika
+        order-nya sedang diproses request lain, notifikasi ditunda lewat inbox (bukan
+        dibuang, karena request lain itu bisa saja rollback).
+
+        Lock diambil setelah snapshot REPEATABLE READ request dimulai, jadi request lain
+        bisa saja commit di antaranya. Write yang gagal dengan serialization failure
+        di-rollback ke savepoint dan notifikasinya ditunda lewat inbox, sehingga request
+        (termasuk call ke Midtrans di `/success`) tidak di-retry oleh Odoo.
+        """
+        if provider_code != 'midtrans':
+            return super()._handle_notification_data(provider_code, notification_data)
+
+        tx = self._get_tx_from_notification_data(provider_code, notification_data)
+        skip_reason = tx._midtrans_get_skip_reason(notification_data)
+        if skip_reason:
+            metrics.notifications_suppressed.inc(reason=skip_reason)
+            _logger.debug("Skipping Midtrans notification for transaction %s (%s)", tx.reference, skip_reason)
+            return tx
+
+        if not tx._midtrans_try_lock():
+            # Callback lain (webhook/success/return/cron) sedang memproses order yang sama
+            tx._midtrans_defer_notification(notification_data)
+            return tx
+
+        start = time.perf_counter()
+        try:
+            with self.env.cr.savepoint():
+                tx._process_notification_data(notification_data)
+        except psycopg2.errors.SerializationFailure:
+            # Request lain sudah commit perubahan transaksi ini setelah snapshot kita dimulai
+            self.env.invalidate_all(flush=False)
+            tx._midtrans_defer_notification(notification_data)
+            return tx
+        finally:
+            metrics.notification_processing.observe(time.perf_counter() - start)
+        tx._execute_callback()
+        return tx
+
+    def _midtrans_get_skip_reason(self, notification_data):
+        """Tell why a notification must be skipped for this transaction
+
+        :return: 'duplicate' jika fingerprint sama dengan notifikasi terakhir yang diproses,
+                 'stale' jika tidak memajukan state transaksi, atau None jika harus diproses
+        :rtype: str | None
+        """
+        self.ensure_one()
+        fingerprint = midtrans_utils.get_notification_fingerprint(notification_data)
+        if self.midtrans_notification_fingerprint == fingerprint:
+            return 'duplicate'
+        target_state = self._midtrans_get_target_state(notification_data)
+        if target_state and const.STATE_RANK[target_state] <= const.STATE_RANK.get(self.state, 0):
+            return 'stale'
+        return None
+
+    def _midtrans_try_lock(self):
+        """Try to take the single-flight lock of each transaction's Midtrans order
+
+        Memakai transaction-level advisory lock tanpa menunggu, sehingga hanya satu
+        request yang memproses notifikasi untuk order yang sama; request lain langsung
+        kembali tanpa blocking atau retry. Lock dilepas saat transaksi database selesai.
+
+        :return: transaksi yang lock-nya berhasil didapat
+        :rtype: recordset of `payment.transaction`
+        """
+        if not self:
+            return self
+        keys = {
+            midtrans_utils.get_lock_key(tx.midtrans_order_id or tx.reference): tx.id for tx in self
+        }
+        self.env.cr.execute(
+            "SELECT key, pg_try_advisory_xact_lock(%s, key) FROM unnest(%s) AS key",
+            [const.ADVISORY_LOCK_NAMESPACE, list(keys)]
+        )
+        return self.browse(keys[key] for key, locked in self.env.cr.fetchall() if locked)
+
+    def _midtrans_defer_notification(self, notification_data):
+        """Defer a notification whose order is being processed by another request
+
+        Notifikasi disimpan ke inbox dan diproses ulang oleh cron setelah request lain
+        selesai; jika ternyata sudah tidak relevan, ia di-skip sebagai duplicate/stale.
+
+        :raise NotificationDeferred: jika dipanggil dari pemrosesan inbox, agar baris
+                                     inbox tetap pending dan dicoba lagi
+        """
+        self.ensure_one()
+        metrics.notifications_suppressed.inc(reason='deferred')
+        _logger.debug("Deferring Midtrans notification for transaction %s, order is locked", self.reference)
+        if self.env.context.get('midtrans_from_inbox'):
+            raise midtrans_utils.NotificationDeferred(self.midtrans_order_id)
+        self.env['payment.midtrans.notification'].sudo()._enqueue(self.provider_id, notification_data)
+
+    @api.model
+    def _midtrans_get_target_state(self, notification_data):
+        """Get the transaction state a Midtrans notification leads to, from `STATUS_MAPPING`
+
+        :return: state target; 'error' jika status tidak dikenali, atau None jika status
+                 dikenali tetapi tidak mengubah state (mis. capture dengan fraud_status deny)
+        :rtype: str | None
+        """
+        transaction_status = notification_data.get('transaction_status')
+        fraud_status = notification_data.get('fraud_status', 'accept')
+        target_state = const.STATUS_MAPPING.get(
+            (transaction_status, fraud_status),
+            const.STATUS_MAPPING.get((transaction_status, None)),
+        )
+        if target_state:
+            return target_state
+        if any(status == transaction_status for status, _fraud in const.STATUS_MAPPING):
+            return None
+        return 'error'
+
+    def _midtrans_set_state(self, target_state, transaction_status):
+        """Apply a target state to the whole recordset in one transition
+
+        :param str target_state: state dari `STATUS_MAPPING`, atau 'error'
+        :param str transaction_status: status Midtrans, dipakai untuk pesan error
+        """
+        setter = getattr(self, const.STATE_SETTERS[target_state])
+        previous_states = {tx.id: tx.state for tx in self}
+        if target_state == 'error':
+            _logger.warning(
+                "Received unrecognized transaction status for transactions %s: %s",
+                self.mapped('reference'), transaction_status
+            )
+            setter("Midtrans: " + _("Unknown transaction status: %s", transaction_status))
+        else:
+            setter()
+        self.env['payment.midtrans.stats']._record_transitions(self, previous_states)
+
     def _process_notification_data(self, notification_data):
         super()._process_notification_data(notification_data)
-        
+
         if self.provider_code != 'midtrans':
             return
 
-        self.midtrans_transaction_id = notification_data.get('transaction_id')
-        
+        self.write({
+            'midtrans_transaction_id': notification_data.get('transaction_id'),
+            'midtrans_payment_type': notification_data.get('payment_type') or self.midtrans_payment_type,
+            'midtrans_notification_fingerprint': midtrans_utils.get_notification_fingerprint(
+                notification_data
+            ),
+        })
+
         transaction_status = notification_data.get('transaction_status')
-        fraud_status = notification_data.get('fraud_status', 'accept')
+        target_state = self._midtrans_get_target_state(notification_data)
 
-        _logger.info(
-            "Processing Midtrans notification for transaction %s: status=%s, fraud=%s",
-            self.reference, transaction_status, fraud_status
+        _logger.debug(
+            "Processing Midtrans notification for transaction %s: status=%s, fraud=%s -> %s",
+            self.reference, transaction_status, notification_data.get('fraud_status'), target_state
         )
 
-        # Update transaction status berdasarkan Midtrans status
-        # Reference: https://docs.midtrans.com/en/after-payment/http-notification
-        
-        if transaction_status == 'capture':
-            # Pembayaran berhasil di-capture (untuk credit card)
-            if fraud_status == 'accept':
-                self._set_done()  # Set status ke 'done'
-            elif fraud_status == 'challenge':
-                self._set_pending()  # Perlu review fraud
-                
-        elif transaction_status == 'settlement':
-            # Pembayaran sukses (untuk non-credit card)
-            self._set_done()
-            
-        elif transaction_status in ['cancel', 'deny', 'expire']:
-            # Pembayaran dibatalkan/ditolak/expired
-            self._set_canceled()
-            
-        elif transaction_status == 'pending':
-            # Pembayaran masih pending (menunggu customer bayar)
-            self._set_pending()
-            
-        else:
-            # Status tidak dikenali
-            _logger.warning(
-                "Received unrecognized transaction status for transaction %s: %s",
-                self.reference, transaction_status
-            )
-            self._set_error(
-                "Midtrans: " + _("Unknown transaction status: %s", transaction_status)
+        if target_state:
+            self._midtrans_set_state(target_state, transaction_status)
+
+    @api.model
+    def _midtrans_get_txs_by_order_ids(self, order_ids):
+        """Batch version of `_midtrans_get_tx_by_order_id`
+
+        :param list order_ids: order id dari Midtrans
+        :rtype: recordset of `payment.transaction`
+        """
+        tx_ids = [
+            int(tx_id) for tx_id in (order_id.rpartition('-')[2] for order_id in order_ids)
+            if tx_id.isdigit()
+        ]
+        order_ids = set(order_ids)
+        txs = self.browse(tx_ids).exists().filtered(
+            lambda tx: tx.midtrans_order_id in order_ids and tx.provider_code == 'midtrans'
+        )
+        missing = order_ids - set(txs.mapped('midtrans_order_id'))
+        if missing:
+            txs |= self.search([
+                ('midtrans_order_id', 'in', list(missing)),
+                ('provider_code', '=', 'midtrans'),
+            ])
+        return txs
+
+    @api.model
+    def _midtrans_process_notifications_batch(self, notifications):
+        """Apply many Midtrans notifications (or status responses) at once
+
+        Transaksi dicari dalam satu query, notifikasi duplikat/stale/in-flight di-skip
+        seperti di `_handle_notification_data`, lalu transaksi dikelompokkan per state
+        target dan setiap transisi diterapkan ke seluruh recordset sekaligus.
+
+        :param list notifications: list payload notifikasi Midtrans
+        :return: transaksi yang diproses
+        :rtype: recordset of `payment.transaction`
+        """
+        # Satu notifikasi per order: ambil yang state target-nya paling maju
+        by_order_id = {}
+        for notification_data in notifications:
+            order_id = notification_data.get('order_id')
+            if not order_id or not notification_data.get('transaction_status'):
+                continue
+            current = by_order_id.get(order_id)
+            rank = const.STATE_RANK.get(self._midtrans_get_target_state(notification_data), 0)
+            if not current or rank >= const.STATE_RANK.get(self._midtrans_get_target_state(current), 0):
+                by_order_id[order_id] = notification_data
+
+        txs = self._midtrans_get_txs_by_order_ids(list(by_order_id))
+        unknown = set(by_order_id) - set(txs.mapped('midtrans_order_id'))
+        if unknown:
+            _logger.warning("Midtrans: no transaction found for order ids %s", sorted(unknown))
+
+        to_process = self.browse()
+        for tx in txs:
+            skip_reason = tx._midtrans_get_skip_reason(by_order_id[tx.midtrans_order_id])
+            if skip_reason:
+                metrics.notifications_suppressed.inc(reason=skip_reason)
+            else:
+                to_process |= tx
+        locked = to_process._midtrans_try_lock()
+        if len(locked) < len(to_process):
+            metrics.notifications_suppressed.inc(len(to_process) - len(locked), reason='in_flight')
+        if not locked:
+            return locked
+
+        start = time.perf_counter()
+        try:
+            locked._midtrans_write_notification_refs(by_order_id)
+
+            groups = defaultdict(lambda: self.browse())
+            for tx in locked:
+                notification_data = by_order_id[tx.midtrans_order_id]
+                target_state = tx._midtrans_get_target_state(notification_data)
+                if target_state:
+                    groups[target_state, notification_data['transaction_status']] |= tx
+
+            for (target_state, transaction_status), group in groups.items():
+                _logger.info(
+                    "Midtrans: setting %s transactions to %s (status=%s)",
+                    len(group), target_state, transaction_status
+                )
+                group._midtrans_set_state(target_state, transaction_status)
+        finally:
+            metrics.notification_processing.observe(time.perf_counter() - start)
+
+        locked._execute_callback()
+        return locked
+
+    def _midtrans_write_notification_refs(self, notifications_by_order_id):
+        """Write Midtrans transaction id, payment type and notification fingerprint in one UPDATE"""
+        fields_to_write = [
+            'midtrans_transaction_id', 'midtrans_payment_type', 'midtrans_notification_fingerprint'
+        ]
+        self.flush_recordset(fields_to_write)
+        values = [
+            (
+                tx.id,
+                notifications_by_order_id[tx.midtrans_order_id].get('transaction_id'),
+                notifications_by_order_id[tx.midtrans_order_id].get('payment_type'),
+                midtrans_utils.get_notification_fingerprint(
+                    notifications_by_order_id[tx.midtrans_order_id]
+                ),
             )
+            for tx in self
+        ]
+        self.env.cr.execute("""
+            UPDATE payment_transaction AS tx
+               SET midtrans_transaction_id = v.transaction_id,
+                   midtrans_payment_type = COALESCE(v.payment_type, tx.midtrans_payment_type),
+                   midtrans_notification_fingerprint = v.fingerprint,
+                   write_uid = %s,
+                   write_date = NOW() AT TIME ZONE 'UTC'
+              FROM unnest(%s::int[], %s::varchar[], %s::varchar[], %s::varchar[])
+                AS v(id, transaction_id, payment_type, fingerprint)
+             WHERE tx.id = v.id
+        """, [self.env.uid] + [list(column) for column in zip(*values)])
+        self.invalidate_recordset(fields_to_write + ['write_uid', 'write_date'])
 
-    def _create_midtrans_transaction(self):
-        
+    def _midtrans_get_snap_data(self):
+        """Get the Snap token and redirect URL, reusing the cached token when still valid.
+
+        Token di-cache pada transaksi sampai mendekati masa berlakunya, dan dibuat ulang
+        jika amount, currency atau order lines berubah. Request paralel untuk transaksi
+        yang sama di-serialisasi dengan row lock sehingga hanya satu yang memanggil API;
+        request yang kalah mendapat serialization failure dan di-retry oleh Odoo, lalu
+        memakai token yang sudah di-commit. Jangan menelan `psycopg2.OperationalError`
+        di pemanggil.
+
+        :return: dict dengan `snap_token` dan `redirect_url`
+        :rtype: dict
+        """
         self.ensure_one()
-        
-        server_key = self.provider_id.midtrans_server_key
-        api_url = self.provider_id._get_midtrans_api_url()
-        
+        cache_key = self._midtrans_get_snap_cache_key()
+        snap_data = self._midtrans_get_cached_snap_data(cache_key)
+        if snap_data:
+            return snap_data
 
-        auth_string = base64.b64encode(f"{server_key}:".encode()).decode()
-        
-        headers = {
-            'Accept': 'application/json',
-            'Content-Type': 'application/json',
-            'Authorization': f'Basic {auth_string}'
+        # Request lain untuk tx yang sama menunggu di sini, lalu memakai token yang sudah dibuat
+        self.env.cr.execute(
+            "SELECT id FROM payment_transaction WHERE id = %s FOR UPDATE", [self.id]
+        )
+        self.invalidate_recordset([
+            'midtrans_snap_token', 'midtrans_snap_redirect_url',
+            'midtrans_snap_token_expiry', 'midtrans_snap_cache_key',
+        ])
+        snap_data = self._midtrans_get_cached_snap_data(cache_key)
+        if snap_data:
+            return snap_data
+
+        snap_data = self._create_midtrans_transaction()
+        self.write({
+            'midtrans_snap_token': snap_data['snap_token'],
+            'midtrans_snap_redirect_url': snap_data['redirect_url'],
+            'midtrans_snap_token_expiry': fields.Datetime.now() + timedelta(
+                hours=const.SNAP_TOKEN_LIFETIME_HOURS
+            ),
+            'midtrans_snap_cache_key': cache_key,
+            'midtrans_expires_at': snap_data['expires_at'],
+        })
+        return snap_data
+
+    def _midtrans_get_cached_snap_data(self, cache_key):
+        self.ensure_one()
+        if (
+            not self.midtrans_snap_token
+            or self.midtrans_snap_cache_key != cache_key
+            or not self.midtrans_snap_token_expiry
+        ):
+            return None
+        margin = timedelta(minutes=const.SNAP_TOKEN_EXPIRY_MARGIN_MINUTES)
+        if self.midtrans_snap_token_expiry - margin <= fields.Datetime.now():
+            return None
+        return {
+            'snap_token': self.midtrans_snap_token,
+            'redirect_url': self.midtrans_snap_redirect_url,
         }
+
+    def _midtrans_get_snap_cache_key(self):
+        """Hash amount, currency dan item details yang dikirim ke Midtrans"""
+        self.ensure_one()
+        parts = [self.midtrans_order_id or '', str(int(self.amount)), self.currency_id.name or '']
+        parts += [
+            f"{item['id']}:{item['price']}:{item['quantity']}"
+            for item in self._midtrans_prepare_item_details(int(self.amount))
+        ]
+        return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+    def _midtrans_prepare_item_details(self, gross_amount):
+        """Build Snap `item_details` from all linked invoices or sale orders
+
+        Semua line dibaca sekaligus dengan satu `read` per model sehingga jumlah query
+        tidak bergantung pada jumlah line. Jika transaksi punya invoice, line invoice
+        yang dipakai; jika tidak, line dari semua sale order. Selisih pembulatan
+        ditambahkan sebagai item terpisah agar total item sama dengan `gross_amount`;
+        selisih yang lebih besar (pembayaran sebagian) diganti satu item ringkasan.
+
+        :param int gross_amount: gross amount yang dikirim ke Midtrans
+        :return: list item untuk payload Snap, kosong jika tidak ada dokumen terkait
+        :rtype: list
+        """
+        self.ensure_one()
+        if 'invoice_ids' in self._fields and self.invoice_ids:
+            lines = self.invoice_ids.invoice_line_ids
+            line_vals = [
+                vals for vals in lines.read(
+                    ['product_id', 'name', 'price_total', 'quantity', 'display_type'], load=None
+                ) if vals['display_type'] == 'product'
+            ]
+        elif 'sale_order_ids' in self._fields and self.sale_order_ids:
+            lines = self.sale_order_ids.order_line
+            line_vals = [
+                dict(vals, quantity=vals['product_uom_qty']) for vals in lines.read(
+                    ['product_id', 'name', 'price_total', 'product_uom_qty', 'display_type'], load=None
+                ) if not vals['display_type']
+            ]
+        else:
+            return []
+
+        item_details = []
+        for vals in line_vals:
+            quantity = vals['quantity']
+            price_total = vals['price_total']
+            name = (vals['name'] or '').split('\n', 1)[0]
+            if quantity and float(quantity).is_integer():
+                price, quantity = round(price_total / quantity), int(quantity)
+            else:
+                # Quantity pecahan tidak didukung Midtrans; kirim sebagai satu item total
+                price, quantity = round(price_total), 1
+            item_details.append({
+                'id': str(vals['product_id'] or vals['id']),
+                'name': name[:const.ITEM_NAME_MAX_LENGTH],
+                'price': price,
+                'quantity': quantity,
+            })
+
+        difference = gross_amount - sum(item['price'] * item['quantity'] for item in item_details)
+        # Batas error pembulatan: setengah per unit yang dibulatkan, plus truncation gross amount
+        max_rounding = sum(0.5 * item['quantity'] for item in item_details) + 1
+        if abs(difference) > max_rounding:
+            # Bukan selisih pembulatan (mis. pembayaran DP/sebagian invoice): kirim satu item
+            # ringkasan agar customer tidak melihat potongan besar di Snap
+            return [{
+                'id': self.reference[:const.ITEM_NAME_MAX_LENGTH],
+                'name': _("Payment for %s", self.reference)[:const.ITEM_NAME_MAX_LENGTH],
+                'price': gross_amount,
+                'quantity': 1,
+            }]
+        if difference:
+            item_details.append({
+                'id': 'ROUNDING',
+                'name': _("Rounding Adjustment"),
+                'price': difference,
+                'quantity': 1,
+            })
+        return item_details
+
+    def _midtrans_prepare_customer_details(self):
+        """Build Snap `customer_details`, reading all partner fields in one query"""
+        self.ensure_one()
+        partner_vals = self.partner_id.read(['name', 'email', 'phone', 'mobile'])
+        partner_vals = partner_vals[0] if partner_vals else {}
+        return {
+            'first_name': partner_vals.get('name') or 'Guest',
+            'email': partner_vals.get('email') or 'noreply@example.com',
+            'phone': partner_vals.get('phone') or partner_vals.get('mobile') or '08123456789'
+        }
+
+    def _create_midtrans_transaction(self):
+        
+        self.ensure_one()
         
         base_url = self.provider_id.get_base_url()
+        gross_amount = int(self.amount)  # Harus integer
         
         # Prepare transaction data untuk Midtrans Snap API
         # Reference: https://docs.midtrans.com/en/snap/integration-guide
         payload = {
             'transaction_details': {
                 'order_id': self.midtrans_order_id,
-                'gross_amount': int(self.amount)  # Harus integer
-            },
-            'customer_details': {
-                'first_name': self.partner_id.name or 'Guest',
-                'email': self.partner_id.email or 'noreply@example.com',
-                'phone': self.partner_id.phone or self.partner_id.mobile or '08123456789'
+                'gross_amount': gross_amount
             },
+            'customer_details': self._midtrans_prepare_customer_details(),
             'callbacks': {
                 'finish': urls.url_join(base_url, '/payment/midtrans/return')
-            }
+            },
+            'expiry': {
+                'unit': 'minute',
+                'duration': const.SNAP_PAYMENT_EXPIRY_MINUTES,
+            },
         }
+        expires_at = fields.Datetime.now() + timedelta(minutes=const.SNAP_PAYMENT_EXPIRY_MINUTES)
         
-        if hasattr(self, 'sale_order_ids') and self.sale_order_ids:
-            sale_order = self.sale_order_ids[0]
-            item_details = []
-            for line in sale_order.order_line:
-                item_details.append({
-                    'id': line.product_id.id,
-                    'name': line.product_id.name,
-                    'price': int(line.price_unit),
-                    'quantity': int(line.product_uom_qty)
-                })
+        item_details = self._midtrans_prepare_item_details(gross_amount)
+        if item_details:
             payload['item_details'] = item_details
         
         try:
-            _logger.info("Creating Midtrans transaction for order %s", self.midtrans_order_id)
+            _logger.debug("Creating Midtrans transaction for order %s", self.midtrans_order_id)
             
-            response = requests.post(
-                f"{api_url}/snap/transactions",
-                headers=headers,
-                data=json.dumps(payload),
-                timeout=10
-            )
+            result = self.provider_id._midtrans_make_request('/snap/transactions', payload=payload)
             
-            response.raise_for_status()
-            result = response.json()
-            
-            _logger.info("Midtrans transaction created successfully: %s", result.get('token'))
+            _logger.info("Midtrans transaction created for order %s", self.midtrans_order_id)
             
             return {
                 'snap_token': result.get('token'),
-                'redirect_url': result.get('redirect_url')
+                'redirect_url': result.get('redirect_url'),
+                'expires_at': expires_at,
             }
             
+        except CircuitOpenError:
+            _logger.warning("Midtrans circuit open, not creating transaction %s", self.midtrans_order_id)
+            raise ValidationError(_(
+                "Midtrans payment is temporarily unavailable. Please try again in a few moments."
+            ))
         except requests.exceptions.RequestException as e:
             _logger.exception("Midtrans API Error: %s", str(e))
             raise ValidationError(
@@ -207,4 +676,296 @@ class PaymentTransaction(models.Model):
             res.update({
                 'midtrans_order_id': self.midtrans_order_id,
             })
-        return res
\ No newline at end of file
+        return res
+
+    @api.model
+    def _midtrans_get_batch_settings(self):
+        """Read the page size, worker count and rate limit of Midtrans batch jobs
+
+        :return: pengaturan dari system parameter, dengan default dari `const`
+        :rtype: BatchSettings
+        :raise ValidationError: jika salah satu nilai bukan angka positif
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        try:
+            settings = midtrans_utils.BatchSettings(
+                page_size=int(ICP.get_param(const.RECONCILE_PAGE_SIZE_PARAM, const.RECONCILE_PAGE_SIZE)),
+                workers=int(ICP.get_param(const.RECONCILE_WORKERS_PARAM, const.RECONCILE_WORKERS)),
+                rate_limit=float(ICP.get_param(const.RECONCILE_RATE_LIMIT_PARAM, const.RECONCILE_RATE_LIMIT)),
+            )
+        except ValueError as e:
+            raise ValidationError(_("Invalid Midtrans batch settings: %s", e)) from e
+        if any(value <= 0 for value in settings):
+            raise ValidationError(_(
+                "Midtrans page size, workers and rate limit must be positive (got %s, %s and %s).",
+                *settings
+            ))
+        return settings
+
+    @api.model
+    def _cron_midtrans_reconcile_pending(self):
+        """Refresh status of pending and authorized Midtrans transactions
+
+        Transaksi draft yang sudah mendapat token Snap juga dicek: jika semua webhook
+        hilang (mis. saat outage), transaksi yang sudah dibayar tidak pernah keluar
+        dari draft. Transaksi diproses per halaman. Status diambil paralel lewat thread pool
+        dengan rate limit global, lalu diterapkan dan di-commit per halaman.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        page_size, workers, rate_limit = self._midtrans_get_batch_settings()
+        min_age = int(ICP.get_param(const.RECONCILE_MIN_AGE_PARAM, const.RECONCILE_MIN_AGE))
+
+        rate_limiter = midtrans_utils.RateLimiter(rate_limit)
+        domain = [
+            ('provider_code', '=', 'midtrans'),
+            ('midtrans_order_id', '!=', False),
+            '|',
+            ('state', 'in', ('pending', 'authorized')),
+            '&', ('state', '=', 'draft'), ('midtrans_snap_token', '!=', False),
+            ('create_date', '<', fields.Datetime.now() - timedelta(minutes=min_age)),
+        ]
+        last_id = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                txs = self.sudo().search(domain + [('id', '>', last_id)], order='id', limit=page_size)
+                if not txs:
+                    break
+                last_id = txs[-1].id
+                statuses = txs._midtrans_fetch_statuses(executor, rate_limiter)
+                txs._midtrans_apply_statuses(statuses)
+                self.env.cr.commit()
+
+    @api.model
+    def _cron_midtrans_expire_pending(self):
+        """Cancel Midtrans transactions whose Snap payment window has expired
+
+        Semua transaksi di sini sudah mendapat token Snap, jadi customer mungkin sudah
+        membayar walaupun webhook-nya hilang. Status setiap transaksi dicek dulu ke
+        Midtrans dan diterapkan (settlement -> done, expire -> cancel); yang dibalas 404
+        (tidak pernah dibuat di Midtrans) dibatalkan lokal dengan satu transisi state per
+        halaman. Cek ini bisa dimatikan lewat `EXPIRY_CHECK_BORDERLINE_PARAM`, maka semua
+        transaksi kedaluwarsa langsung dibatalkan lokal.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        page_size, workers, rate_limit = self._midtrans_get_batch_settings()
+        check_status = str2bool(ICP.get_param(const.EXPIRY_CHECK_BORDERLINE_PARAM, 'True'))
+
+        rate_limiter = midtrans_utils.RateLimiter(rate_limit)
+        domain = [
+            ('provider_code', '=', 'midtrans'),
+            ('state', 'in', ('draft', 'pending')),
+            ('midtrans_expires_at', '<', fields.Datetime.now() - timedelta(minutes=const.EXPIRY_GRACE_MINUTES)),
+        ]
+        last_id = 0
+        canceled_count = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                txs = self.sudo().search(domain + [('id', '>', last_id)], order='id', limit=page_size)
+                if not txs:
+                    break
+                last_id = txs[-1].id
+
+                if check_status:
+                    statuses = txs._midtrans_fetch_statuses(executor, rate_limiter)
+                    # Midtrans membalas status_code 404 jika transaksi tidak pernah dibuat di sana;
+                    # status yang gagal diambil dicoba lagi pada run berikutnya
+                    abandoned = txs.filtered(
+                        lambda tx: tx in statuses and not statuses[tx].get('transaction_status')
+                    )
+                    txs._midtrans_apply_statuses(statuses)
+                else:
+                    abandoned = txs
+
+                abandoned = abandoned._midtrans_try_lock()
+                if abandoned:
+                    abandoned._midtrans_set_state('cancel', 'expire')
+                    canceled_count += len(abandoned)
+                self.env.cr.commit()
+        if canceled_count:
+            _logger.info("Midtrans: canceled %s expired transactions", canceled_count)
+
+    def _midtrans_schedule_status_check(self):
+        """Schedule a background status verification of the transactions"""
+        self.write({'midtrans_status_check_requested': True})
+        self.env.ref('payment_midtrans.ir_cron_midtrans_verify_returns')._trigger()
+
+    @api.model
+    def _cron_midtrans_verify_returns(self):
+        """Verify the status of transactions for which a status check was requested"""
+        page_size, workers, _rate_limit = self._midtrans_get_batch_settings()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                txs = self.sudo().search(
+                    [('midtrans_status_check_requested', '=', True)], order='id', limit=page_size
+                )
+                if not txs:
+                    break
+                txs.write({'midtrans_status_check_requested': False})
+                statuses = txs.filtered('midtrans_order_id')._midtrans_fetch_statuses(executor)
+                txs._midtrans_apply_statuses(statuses)
+                self.env.cr.commit()
+
+    def _midtrans_fetch_statuses(self, executor, rate_limiter=None):
+        """Fetch Midtrans status of the transactions concurrently
+
+        :param executor: `concurrent.futures.Executor` untuk request paralel
+        :param RateLimiter rate_limiter: pembatas request per detik, opsional
+        :return: {transaction: status_data} untuk status yang berhasil diambil
+        :rtype: dict
+        """
+        results = self._midtrans_call_concurrently(
+            executor, '/{order_id}/status', rate_limiter=rate_limiter
+        )
+        statuses = {}
+        for tx, result in results.items():
+            if isinstance(result, Exception):
+                _logger.warning("Midtrans: unable to fetch status of order %s: %s", tx.midtrans_order_id, result)
+            else:
+                statuses[tx] = result
+        self.env['payment.midtrans.audit'].sudo()._log('status', list(statuses.values()))
+        return statuses
+
+    def _midtrans_call_concurrently(self, executor, endpoint, method='GET', payloads=None, rate_limiter=None):
+        """Call a Midtrans endpoint for each transaction concurrently
+
+        Hanya request HTTP yang berjalan di thread pool; ORM tetap di thread utama.
+
+        :param executor: `concurrent.futures.Executor` untuk request paralel
+        :param str endpoint: endpoint dengan placeholder `{order_id}`, mis. '/{order_id}/status'
+        :param str method: HTTP method
+        :param dict payloads: {transaction: payload JSON}, opsional
+        :param RateLimiter rate_limiter: pembatas request per detik, opsional
+        :return: {transaction: response JSON, atau exception jika request gagal}
+        :rtype: dict
+        """
+        clients = {provider: provider._midtrans_get_client() for provider in self.provider_id}
+        payloads = payloads or {}
+
+        def _call(client, order_id, payload):
+            if rate_limiter:
+                rate_limiter.acquire()
+            return client.request(method, endpoint.format(order_id=order_id), payload=payload)
+
+        futures = {
+            tx: executor.submit(_call, clients[tx.provider_id], tx.midtrans_order_id, payloads.get(tx))
+            for tx in self
+        }
+        results = {}
+        for tx, future in futures.items():
+            try:
+                results[tx] = future.result()
+            except (requests.exceptions.RequestException, ValueError) as e:
+                results[tx] = e
+        return results
+
+    @api.model
+    def _midtrans_apply_statuses(self, statuses):
+        """Apply fetched Midtrans statuses through the notification flow
+
+        :param dict statuses: {transaction: status_data}
+        """
+        # Midtrans membalas status_code 404 jika customer belum memilih metode bayar
+        statuses = {
+            tx: status_data for tx, status_data in statuses.items()
+            if status_data.get('transaction_status')
+        }
+        try:
+            with self.env.cr.savepoint():
+                self._midtrans_process_notifications_batch(list(statuses.values()))
+            return
+        except Exception:
+            _logger.exception("Midtrans: batch status update failed, applying statuses one by one")
+
+        for tx, status_data in statuses.items():
+            try:
+                with self.env.cr.savepoint():
+                    tx._handle_notification_data('midtrans', status_data)
+            except Exception:
+                _logger.exception("Midtrans: unable to apply status of order %s", tx.midtrans_order_id)
+
+    def _midtrans_action_bulk(self, action):
+        """Cancel, expire or refund the selected Midtrans transactions at once
+
+        Request ke Midtrans dikirim paralel lewat thread pool dengan rate limit, lalu
+        semua hasil sukses diterapkan dalam satu update batch.
+
+        :param str action: 'cancel', 'expire' atau 'refund'
+        :return: action window berisi hasil per transaksi
+        :rtype: dict
+        :raise AccessError: jika user bukan Accounting Administrator
+        """
+        # Method ini publik (call_kw) dan bekerja dengan sudo; cek hak akses sebelum
+        # ada request apa pun ke Midtrans
+        if not self.env.user.has_group('account.group_account_manager'):
+            raise AccessError(_("Only accounting administrators can cancel, expire or refund Midtrans transactions."))
+        _page_size, workers, rate_limit = self._midtrans_get_batch_settings()
+
+        eligible = self.filtered(
+            lambda tx: tx.provider_code == 'midtrans'
+            and tx.midtrans_order_id
+            and tx.state in const.BULK_ACTION_STATES[action]
+        )
+        outcomes = {
+            tx: ('skipped', _("Transaction is not a Midtrans transaction in a state allowing this action."))
+            for tx in self - eligible
+        }
+
+        payloads = None
+        if action == 'refund':
+            payloads = {
+                tx: {
+                    'refund_key': f'{tx.midtrans_order_id}-refund',
+                    'amount': int(tx.currency_id.round(tx.amount)),
+                    'reason': _("Refunded from Odoo"),
+                }
+                for tx in eligible
+            }
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = eligible.sudo()._midtrans_call_concurrently(
+                executor, f'/{{order_id}}/{action}', method='POST', payloads=payloads,
+                rate_limiter=midtrans_utils.RateLimiter(rate_limit),
+            )
+
+        self.env['payment.midtrans.audit'].sudo()._log('action', list(results.values()))
+        succeeded = {}
+        for tx, result in results.items():
+            if isinstance(result, Exception):
+                outcomes[tx] = ('failed', str(result))
+            elif str(result.get('status_code')) != '200':
+                # Midtrans membalas HTTP 200 dengan status_code error di body
+                outcomes[tx] = ('failed', result.get('status_message') or result.get('status_code'))
+            else:
+                succeeded[tx] = result
+                outcomes[tx] = ('done', result.get('status_message') or '')
+
+        if action == 'refund':
+            self.sudo()._midtrans_apply_refunds(succeeded)
+        else:
+            self.sudo()._midtrans_apply_statuses(succeeded)
+        _logger.info(
+            "Midtrans bulk %s: %s succeeded, %s failed or skipped",
+            action, len(succeeded), len(outcomes) - len(succeeded)
+        )
+        return self.env['payment.midtrans.bulk.result']._open_results(action, outcomes)
+
+    @api.model
+    def _midtrans_apply_refunds(self, responses):
+        """Buat child refund transaction untuk refund yang diterima Midtrans, lalu set done sekaligus
+
+        :param dict responses: {transaction: response refund Midtrans}
+        """
+        refunds = self.browse()
+        for tx in responses:
+            refunds |= tx._create_child_transaction(tx.amount, is_refund=True)
+        if refunds:
+            refunds._set_done()
+
+    def action_midtrans_bulk_cancel(self):
+        return self._midtrans_action_bulk('cancel')
+
+    def action_midtrans_bulk_expire(self):
+        return self._midtrans_action_bulk('expire')
+
+    def action_midtrans_bulk_refund(self):
+        return self._midtrans_action_bulk('refund')
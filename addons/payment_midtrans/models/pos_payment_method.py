@@ -0,0 +1,43 @@
+from odoo import _, fields, models
+from odoo.exceptions import UserError
+
+
+class PosPaymentMethod(models.Model):
+    _inherit = 'pos.payment.method'
+
+    midtrans_provider_id = fields.Many2one(
+        'payment.provider',
+        string='Midtrans Provider',
+        domain=[('code', '=', 'midtrans')],
+        help='Provider Midtrans yang dipakai untuk membuat pembayaran QRIS di POS'
+    )
+
+    def _get_payment_terminal_selection(self):
+        return super()._get_payment_terminal_selection() + [('midtrans', 'Midtrans QRIS')]
+
+    def midtrans_create_qris_charge(self, amount, pos_session_id, pos_order_ref=None):
+        """Dipanggil dari POS: buat charge QRIS dan kembalikan data QR + channel bus"""
+        self.ensure_one()
+        pos_session = self.env['pos.session'].browse(pos_session_id).exists()
+        if not pos_session or pos_session.state != 'opened':
+            raise UserError(_("QRIS payments can only be created for an open POS session."))
+        if self not in pos_session.config_id.payment_method_ids:
+            raise UserError(_("%s is not available in this POS session.", self.name))
+        return self.env['payment.midtrans.pos.charge'].sudo()._midtrans_create_charge(
+            self.sudo(), pos_session.sudo(), amount, pos_order_ref=pos_order_ref
+        )
+
+    def midtrans_cancel_qris_charge(self, order_id):
+        """Dipanggil dari POS saat kasir membatalkan pembayaran QRIS yang masih menunggu"""
+        self.ensure_one()
+        charge = self.env['payment.midtrans.pos.charge'].sudo()._midtrans_get_charge_by_order_id(order_id)
+        if charge.payment_method_id != self:
+            return False
+        charge._midtrans_cancel()
+        return charge.state
+
+    def midtrans_get_qris_state(self, order_id):
+        """State tersimpan dari charge, untuk POS yang tersambung ulang setelah bus terputus"""
+        self.ensure_one()
+        charge = self.env['payment.midtrans.pos.charge'].sudo()._midtrans_get_charge_by_order_id(order_id)
+        return charge.state if charge.payment_method_id == self else False
@@ -10,47 +10,69 @@ import { patch } from '@web/core/utils/patch';
 
 console.log('Midtrans Payment Form Module loaded');
 
-let snapScriptTag = document.createElement('script');
-
-// Load Snap JS when document is ready
-document.addEventListener('DOMContentLoaded', function() {
-    BlockUI();
-    if(window.location.pathname.indexOf('/shop/payment') > -1) {
-        jsonrpc('/midtrans/get_snap_js').then(function(response) {
-            console.log('Snap JS response:', response);
-            
-            if(response.production == "1") {
-                snapScriptTag.src = "https://app.midtrans.com/snap/snap.js";
-            } else {
-                snapScriptTag.src = "https://app.sandbox.midtrans.com/snap/snap.js";
-            }
-            
-            snapScriptTag.setAttribute('data-client-key', response.client_key);
+let snapLoadPromise = null;
+
+/**
+ * Load snap.js once, on demand
+ *
+ * URL dan client key di-render server-side di template checkout (data attribute
+ * `data-midtrans-snap-url` / `data-midtrans-client-key`), jadi tidak perlu RPC.
+ */
+function loadSnapJs(snapUrl, clientKey) {
+    if (window.snap) {
+        return Promise.resolve(window.snap);
+    }
+    if (!snapLoadPromise) {
+        snapLoadPromise = new Promise(function(resolve, reject) {
+            const snapScriptTag = document.createElement('script');
+            snapScriptTag.src = snapUrl;
+            snapScriptTag.setAttribute('data-client-key', clientKey);
             snapScriptTag.type = 'text/javascript';
             snapScriptTag.async = true;
-            
-            snapScriptTag.onload = function() {
-                console.log('Snap JS loaded successfully');
-                unblockUI();
-            };
-            
+            snapScriptTag.onload = () => resolve(window.snap);
             snapScriptTag.onerror = function() {
-                console.error('Failed to load Snap JS');
-                unblockUI();
+                // Izinkan retry pada pemilihan berikutnya
+                snapLoadPromise = null;
+                snapScriptTag.remove();
+                reject(new Error('Failed to load Snap JS'));
             };
-            
             document.head.appendChild(snapScriptTag);
-        }).catch(function(error) {
-            console.error('Error loading Snap JS:', error);
-            unblockUI();
         });
     }
-});
+    return snapLoadPromise;
+}
+
+/**
+ * Get the Snap configuration rendered in the checkout template
+ */
+function getSnapConfig(root = document) {
+    const configEl = root.querySelector('[data-midtrans-snap-url]');
+    return configEl && {
+        snapUrl: configEl.dataset.midtransSnapUrl,
+        clientKey: configEl.dataset.midtransClientKey,
+    };
+}
 
 /**
  * Patch PaymentForm to handle Midtrans payments
  */
 patch(paymentForm.prototype, {
+    /**
+     * Start loading snap.js as soon as Midtrans is selected
+     */
+    async _prepareInlineForm(providerId, providerCode, paymentOptionId, paymentMethodCode, flow) {
+        if (providerCode !== 'midtrans') {
+            return super._prepareInlineForm(...arguments);
+        }
+        const radio = document.querySelector('input[name="o_payment_radio"]:checked');
+        const snapConfig = getSnapConfig(this._getInlineForm(radio) || document);
+        if (snapConfig) {
+            loadSnapJs(snapConfig.snapUrl, snapConfig.clientKey).catch(function(error) {
+                console.error('Error loading Snap JS:', error);
+            });
+        }
+    },
+
     /**
      * Set busy state for UI
      */
@@ -101,7 +123,7 @@ patch(paymentForm.prototype, {
             amount: formData['amount'],
             reference: formData['reference'],
             return_url: formData['return_url']
-        }).then(function(response) {
+        }).then(async function(response) {
             console.log('Token response:', response);
             
             if (response.snap_errors) {
@@ -110,7 +132,12 @@ patch(paymentForm.prototype, {
                 return;
             }
 
-            snapScriptTag.setAttribute('data-client-key', response.client_key);
+            const snapConfig = getSnapConfig();
+            if (snapConfig) {
+                await loadSnapJs(snapConfig.snapUrl, snapConfig.clientKey).catch(function(error) {
+                    console.error('Error loading Snap JS:', error);
+                });
+            }
             self._setStateBusy(false);
 
             if (typeof window.snap !== 'undefined') {
@@ -0,0 +1,24 @@
+/** @odoo-module */
+
+import { useEffect } from "@odoo/owl";
+import { AbstractAwaitablePopup } from "@point_of_sale/app/popup/abstract_awaitable_popup";
+
+export class MidtransQrPopup extends AbstractAwaitablePopup {
+    static template = "payment_midtrans.MidtransQrPopup";
+    static defaultProps = {
+        cancelText: "Cancel",
+    };
+
+    setup() {
+        super.setup();
+        // Tutup otomatis begitu status final diterima lewat bus
+        useEffect(
+            (state) => {
+                if (["done", "cancel", "error"].includes(state)) {
+                    this.confirm();
+                }
+            },
+            () => [this.props.status.state]
+        );
+    }
+}
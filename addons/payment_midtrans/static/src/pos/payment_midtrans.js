@@ -0,0 +1,127 @@
+/** @odoo-module */
+
+import { _t } from "@web/core/l10n/translation";
+import { reactive } from "@odoo/owl";
+import { PaymentInterface } from "@point_of_sale/app/payment/payment_interface";
+import { register_payment_method } from "@point_of_sale/app/store/pos_store";
+import { ErrorPopup } from "@point_of_sale/app/errors/popups/error_popup";
+import { MidtransQrPopup } from "@payment_midtrans/pos/midtrans_qr_popup";
+
+// Harus sama dengan const.POS_BUS_NOTIFICATION
+const BUS_NOTIFICATION = "MIDTRANS_QRIS_STATUS";
+const FINAL_STATES = ["done", "cancel", "error"];
+
+/**
+ * Terminal QRIS Midtrans.
+ *
+ * Charge dibuat di server lewat Core API; hasil pembayaran di-push oleh webhook
+ * lewat bus ke channel milik charge, sehingga POS tidak perlu polling /status.
+ */
+export class PaymentMidtrans extends PaymentInterface {
+    setup() {
+        super.setup(...arguments);
+        this.pending = null;
+    }
+
+    async send_payment_request(cid) {
+        await super.send_payment_request(...arguments);
+        const order = this.pos.get_order();
+        const line = order.selected_paymentline;
+        line.set_payment_status("waitingCard");
+
+        let charge;
+        try {
+            charge = await this.env.services.orm.silent.call(
+                "pos.payment.method",
+                "midtrans_create_qris_charge",
+                [[this.payment_method.id], line.amount, this.pos.pos_session.id, order.name]
+            );
+        } catch (error) {
+            this._showError(error.data?.message || _t("Unable to create the QRIS payment."));
+            return false;
+        }
+        line.transaction_id = charge.order_id;
+        return this._waitForPayment(charge);
+    }
+
+    async send_payment_cancel(order, cid) {
+        await super.send_payment_cancel(...arguments);
+        if (!this.pending) {
+            return true;
+        }
+        const { orderId, finish } = this.pending;
+        const state = await this.env.services.orm.silent.call(
+            "pos.payment.method",
+            "midtrans_cancel_qris_charge",
+            [[this.payment_method.id], orderId]
+        );
+        // Pembayaran bisa saja sudah masuk sebelum cancel diproses
+        finish(state === "done" ? "done" : "cancel");
+        return true;
+    }
+
+    close() {
+        if (this.pending) {
+            this.pending.finish("cancel");
+        }
+        super.close(...arguments);
+    }
+
+    _waitForPayment(charge) {
+        const bus = this.env.services.bus_service;
+        const status = reactive({ state: charge.state });
+
+        return new Promise((resolve) => {
+            const onStatus = (payload) => {
+                if (payload.order_id === charge.order_id && FINAL_STATES.includes(payload.state)) {
+                    finish(payload.state);
+                }
+            };
+            const finish = (state) => {
+                if (this.pending?.orderId !== charge.order_id) {
+                    return;
+                }
+                this.pending = null;
+                status.state = state;
+                bus.unsubscribe(BUS_NOTIFICATION, onStatus);
+                bus.deleteChannel(charge.bus_channel);
+                resolve(state === "done");
+            };
+            this.pending = { orderId: charge.order_id, finish };
+
+            bus.subscribe(BUS_NOTIFICATION, onStatus);
+            bus.addChannel(charge.bus_channel);
+            // Notifikasi yang datang sebelum channel aktif tidak terkirim lagi: cek sekali
+            this.env.services.orm.silent
+                .call("pos.payment.method", "midtrans_get_qris_state", [
+                    [this.payment_method.id],
+                    charge.order_id,
+                ])
+                .then((state) => FINAL_STATES.includes(state) && finish(state));
+
+            this.env.services.popup
+                .add(MidtransQrPopup, {
+                    title: _t("Scan QRIS to Pay"),
+                    qrUrl: charge.qr_url,
+                    amount: this.pos.env.utils.formatCurrency(
+                        this.pos.get_order().selected_paymentline.amount
+                    ),
+                    status,
+                })
+                .then(({ confirmed }) => {
+                    if (!confirmed && this.pending?.orderId === charge.order_id) {
+                        this.send_payment_cancel(this.pos.get_order());
+                    }
+                });
+        });
+    }
+
+    _showError(message) {
+        this.env.services.popup.add(ErrorPopup, {
+            title: _t("Midtrans QRIS"),
+            body: message,
+        });
+    }
+}
+
+register_payment_method("midtrans", PaymentMidtrans);
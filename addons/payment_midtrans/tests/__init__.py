@@ -0,0 +1,6 @@
+from . import test_performance
+from . import test_bulk_actions
+from . import test_expiry
+from . import test_notifications
+from . import test_settlement
+from . import test_circuit_breaker
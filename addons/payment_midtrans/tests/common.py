@@ -0,0 +1,102 @@
+import hashlib
+import time
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from odoo.addons.payment.tests.common import PaymentCommon
+from odoo.addons.payment_midtrans import metrics
+from odoo.addons.payment_midtrans.midtrans_client import MidtransClient
+
+
+class MidtransCommon(PaymentCommon):
+
+    _tx_count = 0
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.midtrans = cls._prepare_provider('midtrans', update_values={
+            'midtrans_server_key': 'SB-Mid-server-test',
+            'midtrans_client_key': 'SB-Mid-client-test',
+            'midtrans_merchant_id': 'M000000',
+            'midtrans_notification_mode': 'sync',
+        })
+        cls.provider = cls.midtrans
+        cls.currency = cls.env.ref('base.IDR')
+        cls.currency.active = True
+        cls.amount = 150000.0
+
+    def _create_midtrans_tx(self, **values):
+        MidtransCommon._tx_count += 1
+        values.setdefault('reference', f'MIDTRANS-TEST-{MidtransCommon._tx_count}')
+        tx = self._create_transaction('redirect', **values)
+        tx.midtrans_order_id = f'{tx.reference}-{tx.id}'
+        # Route HTTP membaca lewat cursor yang sama; pastikan perubahan sudah ter-flush
+        tx.env.flush_all()
+        return tx
+
+    def _make_notification(self, tx, transaction_status='settlement', status_code='200', **values):
+        """Build a notification payload with a valid signature"""
+        gross_amount = f'{tx.amount:.2f}'
+        notification = {
+            'order_id': tx.midtrans_order_id,
+            'transaction_id': f'midtrans-{tx.id}',
+            'transaction_status': transaction_status,
+            'fraud_status': 'accept',
+            'payment_type': 'qris',
+            'status_code': status_code,
+            'gross_amount': gross_amount,
+            'signature_key': hashlib.sha512(
+                f'{tx.midtrans_order_id}{status_code}{gross_amount}SB-Mid-server-test'.encode()
+            ).hexdigest(),
+        }
+        notification.update(values)
+        return notification
+
+    @contextmanager
+    def mock_midtrans_api(self, responses=None):
+        """Replace outbound Midtrans calls; yields the list of (method, endpoint) called
+
+        :param dict responses: {endpoint prefix/suffix: response} atau callable(method, endpoint, payload)
+        """
+        calls = []
+
+        def _request(client, method, endpoint, payload=None, timeout=None):
+            calls.append((method, endpoint))
+            if callable(responses):
+                return responses(method, endpoint, payload)
+            if endpoint == '/snap/transactions':
+                return {'token': f'token-{len(calls)}', 'redirect_url': 'https://snap.test/redirect'}
+            for key, response in (responses or {}).items():
+                if endpoint.endswith(key):
+                    return response
+            return {'status_code': '404', 'status_message': "Transaction doesn't exist."}
+
+        with patch.object(MidtransClient, 'request', autospec=True, side_effect=_request):
+            yield calls
+
+    @contextmanager
+    def assertRouteBudget(self, route, max_queries, max_duration):
+        """Assert SQL query count and duration of one call of a controller route
+
+        Angka diambil dari metric `timed_route` sehingga hanya query di dalam handler
+        route yang dihitung, tanpa overhead dispatch HTTP/website.
+        """
+        queries_before = metrics.route_sql_queries.get(route=route)
+        duration_before = metrics.route_duration.get(route=route)
+        start = time.perf_counter()
+        yield
+        wall_time = time.perf_counter() - start
+        queries_sum, _queries_count = metrics.route_sql_queries.get(route=route)
+        duration_sum, duration_count = metrics.route_duration.get(route=route)
+        self.assertEqual(duration_count - duration_before[1], 1, f"Route {route} was not called exactly once")
+        queries = queries_sum - queries_before[0]
+        duration = duration_sum - duration_before[0]
+        self.assertLessEqual(
+            queries, max_queries, f"Route {route} ran {queries} queries, budget is {max_queries}"
+        )
+        self.assertLessEqual(
+            duration, max_duration,
+            f"Route {route} took {duration:.3f}s (wall {wall_time:.3f}s), budget is {max_duration}s"
+        )
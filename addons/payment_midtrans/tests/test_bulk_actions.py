@@ -0,0 +1,17 @@
+from odoo.exceptions import AccessError
+from odoo.tests import new_test_user, tagged
+
+from odoo.addons.payment_midtrans.tests.common import MidtransCommon
+
+
+@tagged('post_install', '-at_install')
+class TestMidtransBulkActions(MidtransCommon):
+
+    def test_bulk_action_requires_accounting_manager(self):
+        tx = self._create_midtrans_tx(state='done')
+        internal_user = new_test_user(self.env, login='midtrans_internal', groups='base.group_user')
+        portal_user = new_test_user(self.env, login='midtrans_portal', groups='base.group_portal')
+        for user in (internal_user, portal_user):
+            with self.mock_midtrans_api() as calls, self.assertRaises(AccessError):
+                tx.with_user(user).action_midtrans_bulk_refund()
+            self.assertFalse(calls, "No request may reach Midtrans before the access check")
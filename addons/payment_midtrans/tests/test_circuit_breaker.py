@@ -0,0 +1,27 @@
+import time
+from unittest.mock import patch
+
+from odoo.tests import BaseCase, tagged
+
+from odoo.addons.payment_midtrans.circuit_breaker import CircuitBreaker
+from odoo.addons.payment_midtrans.midtrans_client import MidtransClient
+
+
+@tagged('post_install', '-at_install')
+class TestMidtransCircuitBreaker(BaseCase):
+
+    def test_probe_released_on_unexpected_error(self):
+        breaker = CircuitBreaker('unused', 1)
+        breaker._open_until = time.time() - 1
+        breaker._synced_at = time.time()
+
+        def _claim_probe():
+            breaker._probing = True
+            return True
+
+        client = MidtransClient('https://api.midtrans.test/v2', 'Basic test', breaker=breaker)
+        with patch.object(breaker, '_claim_probe', side_effect=_claim_probe), \
+                patch.object(client.session, 'request', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                client.get('/order/status')
+        self.assertFalse(breaker._probing)
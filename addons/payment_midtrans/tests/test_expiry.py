@@ -0,0 +1,41 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.tests import tagged
+
+from odoo.addons.payment_midtrans.tests.common import MidtransCommon
+
+
+@tagged('post_install', '-at_install')
+class TestMidtransExpiry(MidtransCommon):
+
+    def _create_expired_tx(self):
+        tx = self._create_midtrans_tx()
+        tx.write({
+            'midtrans_snap_token': 'token-expired',
+            'midtrans_expires_at': fields.Datetime.now() - timedelta(days=2),
+        })
+        return tx
+
+    def _run_sweeper(self, responses):
+        with self.mock_midtrans_api(responses) as calls, patch.object(self.env.cr, 'commit'):
+            self.env['payment.transaction']._cron_midtrans_expire_pending()
+        return calls
+
+    def test_expired_tx_settled_at_midtrans_is_not_canceled(self):
+        """Webhook hilang: transaksi tanpa transaction id yang sudah dibayar harus jadi done"""
+        tx = self._create_expired_tx()
+        self.assertFalse(tx.midtrans_transaction_id)
+
+        calls = self._run_sweeper({'/status': self._make_notification(tx, 'settlement')})
+
+        self.assertIn(('GET', f'/{tx.midtrans_order_id}/status'), calls)
+        self.assertEqual(tx.state, 'done')
+
+    def test_expired_tx_unknown_at_midtrans_is_canceled(self):
+        tx = self._create_expired_tx()
+
+        self._run_sweeper({})  # mock membalas 404 untuk status yang tidak dikenal
+
+        self.assertEqual(tx.state, 'cancel')
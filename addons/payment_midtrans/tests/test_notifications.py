@@ -0,0 +1,26 @@
+from odoo.tests import tagged
+
+from odoo.addons.payment_midtrans.tests.common import MidtransCommon
+
+
+@tagged('post_install', '-at_install')
+class TestMidtransNotifications(MidtransCommon):
+
+    def test_settlement_after_error_is_processed(self):
+        tx = self._create_midtrans_tx()
+        tx._handle_notification_data('midtrans', self._make_notification(tx, 'authorize'))
+        self.assertEqual(tx.state, 'error')
+
+        tx._handle_notification_data('midtrans', self._make_notification(tx, 'settlement'))
+        self.assertEqual(tx.state, 'done')
+
+    def test_stats_follow_latest_payment_type(self):
+        tx = self._create_midtrans_tx()
+        tx._handle_notification_data('midtrans', self._make_notification(tx, 'pending', '201', payment_type=None))
+        tx._handle_notification_data('midtrans', self._make_notification(tx, 'settlement'))
+
+        stats = self.env['payment.midtrans.stats'].search([('provider_id', '=', self.midtrans.id)])
+        by_payment_type = {row.payment_type: row for row in stats}
+        self.assertEqual(by_payment_type['unknown'].tx_count, 0)
+        self.assertEqual(by_payment_type['qris'].tx_count, 1)
+        self.assertEqual(by_payment_type['qris'].done_count, 1)
@@ -0,0 +1,161 @@
+import time
+
+from odoo import Command
+from odoo.tests import tagged
+
+from odoo.addons.payment.tests.http_common import PaymentHttpCommon
+from odoo.addons.payment_midtrans.tests.common import MidtransCommon
+
+# Budget per route: (query SQL maksimum, durasi maksimum dalam detik) untuk satu call dengan
+# Midtrans di-mock. Naikkan budget hanya jika query tambahan memang disengaja.
+ROUTE_BUDGETS = {
+    'notification': (30, 1.0),
+    'notification_duplicate': (10, 0.5),
+    'success': (35, 1.0),
+    'return': (10, 0.5),
+    'get_snap_token': (30, 1.0),
+    'get_snap_token_cached': (10, 0.5),
+}
+PAYLOAD_MAX_QUERIES = 15
+PAYLOAD_MAX_DURATION = {1: 0.5, 100: 1.0, 1000: 3.0}
+
+
+@tagged('post_install', '-at_install')
+class TestMidtransRouteBudgets(MidtransCommon, PaymentHttpCommon):
+
+    def _warm_up(self):
+        """Isi cache config/registry dengan satu notifikasi agar yang diukur adalah hot path"""
+        tx = self._create_midtrans_tx()
+        self._make_json_rpc_request('/payment/midtrans/notification', self._make_notification(tx))
+
+    def test_notification_budget(self):
+        self._warm_up()
+        tx = self._create_midtrans_tx()
+        notification = self._make_notification(tx)
+
+        with self.mock_midtrans_api() as calls:
+            with self.assertRouteBudget('notification', *ROUTE_BUDGETS['notification']):
+                self._make_json_rpc_request('/payment/midtrans/notification', notification)
+            tx.invalidate_recordset()
+            self.assertEqual(tx.state, 'done')
+
+            with self.assertRouteBudget('notification', *ROUTE_BUDGETS['notification_duplicate']):
+                self._make_json_rpc_request('/payment/midtrans/notification', notification)
+        self.assertFalse(calls, "The notification route must not call Midtrans")
+
+    def test_success_budget(self):
+        self._warm_up()
+        tx = self._create_midtrans_tx()
+        status = self._make_notification(tx)
+
+        with self.mock_midtrans_api({'/status': status}) as calls:
+            with self.assertRouteBudget('success', *ROUTE_BUDGETS['success']):
+                self._make_json_rpc_request('/payment/midtrans/success', {'transaction_id': tx.id})
+        self.assertEqual(calls, [('GET', f'/{tx.midtrans_order_id}/status')])
+        tx.invalidate_recordset()
+        self.assertEqual(tx.state, 'done')
+
+    def test_return_budget(self):
+        self._warm_up()
+        tx = self._create_midtrans_tx()
+
+        with self.mock_midtrans_api() as calls:
+            with self.assertRouteBudget('return', *ROUTE_BUDGETS['return']):
+                response = self.url_open(
+                    f'/payment/midtrans/return?order_id={tx.midtrans_order_id}', allow_redirects=False
+                )
+        self.assertEqual(response.status_code, 303)
+        self.assertFalse(calls, "The return route must defer the status check to the cron")
+        tx.invalidate_recordset()
+        self.assertTrue(tx.midtrans_status_check_requested)
+
+    def test_get_snap_token_budget(self):
+        self._warm_up()
+        tx = self._create_midtrans_tx()
+
+        with self.mock_midtrans_api() as calls:
+            with self.assertRouteBudget('get_snap_token', *ROUTE_BUDGETS['get_snap_token']):
+                self._make_json_rpc_request('/payment/midtrans/get_snap_token', {'transaction_id': tx.id})
+            self.assertEqual(len(calls), 1)
+
+            with self.assertRouteBudget('get_snap_token', *ROUTE_BUDGETS['get_snap_token_cached']):
+                self._make_json_rpc_request('/payment/midtrans/get_snap_token', {'transaction_id': tx.id})
+        self.assertEqual(len(calls), 1, "A valid cached Snap token must not call Midtrans again")
+
+
+@tagged('post_install', '-at_install')
+class TestMidtransPayloadBudgets(MidtransCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.product = cls.env['product.product'].create({
+            'name': 'Midtrans Test Product',
+            'list_price': 1500.0,
+            'taxes_id': [Command.clear()],
+        })
+
+    def _create_cart_transaction(self, line_count):
+        order = self.env['sale.order'].create({
+            'partner_id': self.partner.id,
+            'order_line': [
+                Command.create({
+                    'product_id': self.product.id,
+                    'product_uom_qty': 1 + index % 3,
+                    'price_unit': 1500.0,
+                    'tax_id': [Command.clear()],
+                })
+                for index in range(line_count)
+            ],
+        })
+        return self._create_midtrans_tx(
+            amount=order.amount_total, sale_order_ids=[Command.set(order.ids)]
+        )
+
+    def _measure_create(self, tx):
+        self.env.flush_all()
+        self.env.invalidate_all()
+        with self.mock_midtrans_api() as calls:
+            queries_before = self.cr.sql_log_count
+            start = time.perf_counter()
+            tx._create_midtrans_transaction()
+            duration = time.perf_counter() - start
+            queries = self.cr.sql_log_count - queries_before
+        self.assertEqual(len(calls), 1, "Creating a Snap transaction must call Midtrans exactly once")
+        return queries, duration
+
+    def test_create_transaction_query_count_independent_of_cart_size(self):
+        # Warm-up: isi cache registry/config di luar pengukuran
+        self._measure_create(self._create_cart_transaction(1))
+
+        query_counts = {}
+        for line_count, max_duration in PAYLOAD_MAX_DURATION.items():
+            tx = self._create_cart_transaction(line_count)
+            queries, duration = self._measure_create(tx)
+            query_counts[line_count] = queries
+            self.assertLessEqual(
+                queries, PAYLOAD_MAX_QUERIES,
+                f"{line_count} lines: {queries} queries, budget is {PAYLOAD_MAX_QUERIES}"
+            )
+            self.assertLessEqual(
+                duration, max_duration,
+                f"{line_count} lines: took {duration:.3f}s, budget is {max_duration}s"
+            )
+        self.assertEqual(
+            len(set(query_counts.values())), 1,
+            f"Query count depends on the number of cart lines (N+1): {query_counts}"
+        )
+
+    def test_item_details_match_gross_amount(self):
+        tx = self._create_cart_transaction(100)
+        gross_amount = int(tx.amount)
+        item_details = tx._midtrans_prepare_item_details(gross_amount)
+        self.assertEqual(len(item_details), 100)
+        self.assertEqual(sum(item['price'] * item['quantity'] for item in item_details), gross_amount)
+
+    def test_item_details_partial_payment(self):
+        tx = self._create_cart_transaction(10)
+        gross_amount = int(tx.amount / 2)
+        item_details = tx._midtrans_prepare_item_details(gross_amount)
+        self.assertEqual(len(item_details), 1, "A partial payment must not become a rounding item")
+        self.assertEqual(item_details[0]['price'], gross_amount)
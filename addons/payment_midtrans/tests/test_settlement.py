@@ -0,0 +1,39 @@
+import base64
+
+from odoo.tests import tagged
+
+from odoo.addons.payment_midtrans.tests.common import MidtransCommon
+
+
+@tagged('post_install', '-at_install')
+class TestMidtransSettlement(MidtransCommon):
+
+    def _create_settlement(self):
+        return self.env['payment.midtrans.settlement'].create({
+            'name': 'settlement.csv',
+            'provider_id': self.midtrans.id,
+            'file': base64.b64encode(b'order_id,gross_amount\n'),
+        })
+
+    def test_unparseable_amount_is_flagged(self):
+        tx = self._create_midtrans_tx()
+        settlement = self._create_settlement()
+        settlement._process_batch([{
+            'order_id': tx.midtrans_order_id,
+            'gross_amount': 'Rp 150.000',
+            'transaction_status': 'settlement',
+        }])
+        self.assertEqual(settlement.line_ids.reason, 'unparseable')
+        self.assertFalse(settlement.move_ids)
+        self.assertFalse(tx.midtrans_settlement_id)
+
+    def test_refund_of_unpaid_transaction_is_flagged(self):
+        tx = self._create_midtrans_tx()
+        settlement = self._create_settlement()
+        settlement._process_batch([{
+            'order_id': tx.midtrans_order_id,
+            'gross_amount': '150000',
+            'transaction_status': 'refund',
+        }])
+        self.assertEqual(settlement.line_ids.reason, 'status')
+        self.assertFalse(settlement.amount_refund)
@@ -0,0 +1,62 @@
+import hashlib
+import threading
+import time
+from collections import namedtuple
+
+# Konfigurasi provider yang di-cache per worker process (lihat `_midtrans_get_config`)
+MidtransConfig = namedtuple('MidtransConfig', [
+    'server_key', 'auth_header', 'api_url', 'snap_url', 'snap_redirect_url', 'notification_mode',
+])
+
+# Pengaturan job batch Midtrans (cron dan aksi massal), lihat `_midtrans_get_batch_settings`
+BatchSettings = namedtuple('BatchSettings', ['page_size', 'workers', 'rate_limit'])
+
+
+def get_notification_fingerprint(notification_data):
+    """Hitung fingerprint notifikasi untuk deduplikasi.
+
+    :param dict notification_data: payload notifikasi atau response status Midtrans
+    :return: hash dari (order_id, transaction_status, fraud_status, status_code)
+    :rtype: str
+    """
+    key = '|'.join(str(notification_data.get(field) or '') for field in (
+        'order_id', 'transaction_status', 'fraud_status', 'status_code'
+    ))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def get_lock_key(order_id):
+    """Hitung key 32-bit (signed) untuk advisory lock PostgreSQL dari order id"""
+    return int.from_bytes(hashlib.sha1(order_id.encode()).digest()[:4], 'big', signed=True)
+
+
+class NotificationDeferred(Exception):
+    """Notifikasi ditunda karena order yang sama sedang diproses dengan payload lain"""
+
+
+class RateLimiter:
+    """Token bucket sederhana yang thread-safe.
+
+    Dipakai bersama oleh semua thread dalam satu pool agar jumlah request ke
+    Midtrans tidak melebihi `rate` per detik.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Tunggu sampai satu token tersedia"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
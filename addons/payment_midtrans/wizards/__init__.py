@@ -0,0 +1 @@
+from . import payment_midtrans_bulk_result
@@ -0,0 +1,77 @@
+from odoo import _, api, fields, models
+
+
+class PaymentMidtransBulkResult(models.TransientModel):
+    _name = 'payment.midtrans.bulk.result'
+    _description = 'Midtrans Bulk Action Result'
+
+    action = fields.Selection(
+        [
+            ('cancel', 'Cancel'),
+            ('expire', 'Expire'),
+            ('refund', 'Refund'),
+        ],
+        string='Action',
+        readonly=True,
+    )
+    line_ids = fields.One2many(
+        'payment.midtrans.bulk.result.line', 'result_id', string='Results', readonly=True
+    )
+    done_count = fields.Integer(compute='_compute_counts')
+    failed_count = fields.Integer(compute='_compute_counts')
+    skipped_count = fields.Integer(compute='_compute_counts')
+
+    @api.depends('line_ids.outcome')
+    def _compute_counts(self):
+        for result in self:
+            outcomes = result.line_ids.mapped('outcome')
+            result.done_count = outcomes.count('done')
+            result.failed_count = outcomes.count('failed')
+            result.skipped_count = outcomes.count('skipped')
+
+    @api.model
+    def _open_results(self, action, outcomes):
+        """Simpan hasil aksi massal dan buka wizard yang menampilkannya
+
+        :param str action: 'cancel', 'expire' atau 'refund'
+        :param dict outcomes: {transaction: (outcome, message)}
+        """
+        result = self.create({
+            'action': action,
+            'line_ids': [
+                fields.Command.create({
+                    'transaction_id': tx.id,
+                    'outcome': outcome,
+                    'message': message,
+                })
+                for tx, (outcome, message) in outcomes.items()
+            ],
+        })
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _("Midtrans Bulk Action Result"),
+            'res_model': self._name,
+            'res_id': result.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+
+class PaymentMidtransBulkResultLine(models.TransientModel):
+    _name = 'payment.midtrans.bulk.result.line'
+    _description = 'Midtrans Bulk Action Result Line'
+    _order = 'outcome desc, id'
+
+    result_id = fields.Many2one('payment.midtrans.bulk.result', required=True, ondelete='cascade')
+    transaction_id = fields.Many2one('payment.transaction', string='Transaction', readonly=True)
+    reference = fields.Char(related='transaction_id.reference')
+    outcome = fields.Selection(
+        [
+            ('done', 'Done'),
+            ('failed', 'Failed'),
+            ('skipped', 'Skipped'),
+        ],
+        string='Outcome',
+        readonly=True,
+    )
+    message = fields.Char(string='Message', readonly=True)
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""Benchmark throughput addon `payment_midtrans` terhadap simulator lokal.
+
+Skenario:
+    tokens    panggil /payment/midtrans/get_snap_token untuk daftar transaction id
+    webhooks  kirim notifikasi ber-signature valid untuk daftar order id
+
+Laporan: p50/p99 latency, throughput, dan jumlah query SQL per request (diambil
+dari selisih metric `midtrans_route_sql_queries` di /payment/midtrans/metrics,
+jalankan Odoo dengan `workers = 0` agar semua delta ikut ter-flush saat scrape;
+worker lain baru menyetor metric-nya pada request berikutnya).
+Hasil ditambahkan ke `results/<scenario>.jsonl` bersama versi addon dan git
+revision, sehingga bisa dibandingkan antar release.
+
+Contoh:
+    # simulator dijalankan di proses yang sama
+    python3 midtrans_bench.py webhooks --odoo-url http://localhost:8069 \\
+        --server-key SB-Mid-server-xxx --order-ids-file order_ids.txt \\
+        --concurrency 32 --requests 5000 --metrics-token secret --start-simulator
+
+    python3 midtrans_bench.py tokens --odoo-url http://localhost:8069 \\
+        --tx-ids 1-1000 --concurrency 16 --metrics-token secret
+"""
+import argparse
+import ast
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from midtrans_simulator import MidtransSimulator, send_notification
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(HERE, 'results')
+MANIFEST = os.path.join(HERE, '..', '..', 'addons', 'payment_midtrans', '__manifest__.py')
+
+SCENARIO_ROUTES = {
+    'tokens': 'get_snap_token',
+    'webhooks': 'notification',
+}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+def parse_ids(spec):
+    """'1-100,200,300-310' -> [1, ..., 100, 200, 300, ..., 310]"""
+    ids = []
+    for part in spec.split(','):
+        start, _sep, end = part.partition('-')
+        ids.extend(range(int(start), int(end or start) + 1))
+    return ids
+
+
+def json_rpc(url, params, timeout=60):
+    body = json.dumps({'jsonrpc': '2.0', 'method': 'call', 'params': params}).encode()
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        data = json.loads(response.read())
+    return time.perf_counter() - start, data
+
+
+def check_rpc_result(data):
+    """Raise jika response JSON-RPC menandakan kegagalan
+
+    Route `type='json'` Odoo selalu membalas HTTP 200, jadi kegagalan harus dibaca
+    dari body: `error` JSON-RPC, atau result addon berisi `error`, `status: error`
+    atau `success: false`.
+    """
+    if isinstance(data, (bytes, str)):
+        data = json.loads(data)
+    if data.get('error'):
+        raise RuntimeError(f"JSON-RPC error: {data['error'].get('message', data['error'])}")
+    result = data.get('result')
+    if isinstance(result, dict) and (
+        result.get('error') or result.get('status') == 'error' or result.get('success') is False
+    ):
+        raise RuntimeError(f"route error: {result.get('error') or result.get('message')}")
+    return result
+
+
+def read_sql_metrics(odoo_url, token, route):
+    """Ambil (sum, count) histogram midtrans_route_sql_queries untuk route"""
+    if not token:
+        return None
+    req = urllib.request.Request(
+        odoo_url.rstrip('/') + '/payment/midtrans/metrics',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    with urllib.request.urlopen(req, timeout=30) as response:
+        text = response.read().decode()
+    totals = {'sum': 0.0, 'count': 0.0}
+    pattern = re.compile(r'^midtrans_route_sql_queries_(sum|count)\{([^}]*)\} (\S+)$')
+    for line in text.splitlines():
+        match = pattern.match(line)
+        if match and f'route="{route}"' in match.group(2):
+            totals[match.group(1)] += float(match.group(3))
+    return totals
+
+
+def run(tasks, concurrency):
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for result in executor.map(_safe_call, tasks):
+            if result is None:
+                errors += 1
+            else:
+                latencies.append(result)
+    return latencies, errors, time.perf_counter() - start
+
+
+def _safe_call(task):
+    try:
+        return task()
+    except Exception as e:  # noqa: BLE001 - dihitung sebagai error benchmark
+        print(f'request failed: {e}', file=sys.stderr)
+        return None
+
+
+def build_tasks(args, simulator):
+    if args.scenario == 'tokens':
+        url = args.odoo_url.rstrip('/') + '/payment/midtrans/get_snap_token'
+        tx_ids = parse_ids(args.tx_ids)
+        return [
+            (lambda tx_id=tx_ids[i % len(tx_ids)]: timed_call(json_rpc, url, {'transaction_id': tx_id}))
+            for i in range(args.requests or len(tx_ids))
+        ]
+
+    with open(args.order_ids_file) as f:
+        order_ids = [line.strip() for line in f if line.strip()]
+    statuses = args.statuses.split(',')
+    tasks = []
+    for i in range(args.requests or len(order_ids)):
+        order_id = order_ids[i % len(order_ids)]
+        transaction = simulator.state.create(order_id, args.gross_amount) if simulator else {
+            'order_id': order_id,
+            'transaction_id': order_id,
+            'gross_amount': f'{args.gross_amount:.2f}',
+            'fraud_status': 'accept',
+        }
+        transaction.update({
+            'transaction_status': statuses[i % len(statuses)],
+            'status_code': '200',
+        })
+        tasks.append(lambda tx=transaction: timed_call(
+            post_notification, args.odoo_url, args.server_key, tx
+        ))
+    return tasks
+
+
+def post_notification(odoo_url, server_key, transaction):
+    _status, latency, data = send_notification(odoo_url, server_key, transaction)
+    return latency, data
+
+
+def timed_call(call, *args):
+    """Jalankan call yang mengembalikan (latency, body) dan validasi body-nya"""
+    latency, data = call(*args)
+    check_rpc_result(data)
+    return latency
+
+
+def get_addon_version():
+    with open(MANIFEST) as f:
+        return ast.literal_eval(f.read()).get('version')
+
+
+def get_git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('scenario', choices=sorted(SCENARIO_ROUTES))
+    parser.add_argument('--odoo-url', default='http://localhost:8069')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=0, help="Jumlah request (default: satu per id)")
+    parser.add_argument('--metrics-token', help="Nilai payment_midtrans.metrics_token untuk hitung query SQL")
+    parser.add_argument('--tx-ids', default='1-100', help="Transaction id untuk skenario tokens")
+    parser.add_argument('--order-ids-file', help="File berisi satu order id per baris (skenario webhooks)")
+    parser.add_argument('--server-key', help="Server key provider untuk signature notifikasi")
+    parser.add_argument('--statuses', default='settlement', help="Status notifikasi, dipisah koma")
+    parser.add_argument('--gross-amount', type=float, default=10000.0)
+    parser.add_argument('--start-simulator', action='store_true', help="Jalankan simulator di proses ini")
+    parser.add_argument('--simulator-port', type=int, default=8899)
+    parser.add_argument('--simulator-latency-ms', type=float, default=0.0)
+    parser.add_argument('--label', default='', help="Label bebas untuk hasil benchmark")
+    args = parser.parse_args()
+
+    if args.scenario == 'webhooks' and not (args.order_ids_file and args.server_key):
+        parser.error("webhooks membutuhkan --order-ids-file dan --server-key")
+
+    simulator = None
+    if args.start_simulator:
+        simulator = MidtransSimulator(('127.0.0.1', args.simulator_port), args.simulator_latency_ms / 1000)
+        simulator.start_background()
+
+    route = SCENARIO_ROUTES[args.scenario]
+    tasks = build_tasks(args, simulator)
+    sql_before = read_sql_metrics(args.odoo_url, args.metrics_token, route)
+    latencies, errors, duration = run(tasks, args.concurrency)
+    sql_after = read_sql_metrics(args.odoo_url, args.metrics_token, route)
+
+    queries_per_request = None
+    if sql_before and sql_after and sql_after['count'] > sql_before['count']:
+        queries_per_request = (
+            (sql_after['sum'] - sql_before['sum']) / (sql_after['count'] - sql_before['count'])
+        )
+
+    result = {
+        'scenario': args.scenario,
+        'label': args.label,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'addon_version': get_addon_version(),
+        'git_revision': get_git_revision(),
+        'concurrency': args.concurrency,
+        'requests': len(tasks),
+        'errors': errors,
+        'duration_s': round(duration, 3),
+        'throughput_rps': round(len(latencies) / duration, 2) if duration else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        'sql_queries_per_request': round(queries_per_request, 2) if queries_per_request is not None else None,
+    }
+    print(json.dumps(result, indent=2))
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(os.path.join(RESULTS_DIR, f'{args.scenario}.jsonl'), 'a') as f:
+        f.write(json.dumps(result) + '\n')
+
+    if simulator:
+        simulator.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""Simulator lokal Midtrans untuk load test addon `payment_midtrans`.
+
+Mengimplementasikan endpoint yang dipakai addon (dengan base path `/v2`):
+
+    POST /v2/snap/transactions      -> {"token", "redirect_url"}
+    GET  /v2/{order_id}/status      -> status transaksi tersimpan
+    POST /v2/{order_id}/cancel      -> transaction_status = cancel
+    POST /v2/{order_id}/expire      -> transaction_status = expire
+    POST /v2/{order_id}/refund      -> transaction_status = refund
+    POST /v2/charge                 -> Core API charge (mis. QRIS)
+
+Selain itu simulator dapat mengirim notifikasi ber-signature valid ke
+`/payment/midtrans/notification` (lihat `send_notification`).
+
+Agar Odoo memakai simulator, set system parameter
+`payment_midtrans.api_url_override` ke `http://<host>:<port>/v2`.
+
+Contoh:
+    python3 midtrans_simulator.py --port 8899 --latency-ms 80 --error-rate 0.01
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MidtransState:
+    """Penyimpanan status transaksi di memori, thread-safe"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._transactions = {}
+
+    def create(self, order_id, gross_amount, payment_type='snap'):
+        with self._lock:
+            tx = self._transactions.setdefault(order_id, {
+                'order_id': order_id,
+                'transaction_id': str(uuid.uuid4()),
+                'gross_amount': f'{float(gross_amount):.2f}',
+                'payment_type': payment_type,
+                'transaction_status': 'pending',
+                'fraud_status': 'accept',
+                'status_code': '201',
+                'currency': 'IDR',
+                'transaction_time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            })
+            return dict(tx)
+
+    def get(self, order_id):
+        with self._lock:
+            tx = self._transactions.get(order_id)
+            return dict(tx) if tx else None
+
+    def set_status(self, order_id, transaction_status, status_code='200'):
+        with self._lock:
+            tx = self._transactions.get(order_id)
+            if not tx:
+                return None
+            tx['transaction_status'] = transaction_status
+            tx['status_code'] = status_code
+            return dict(tx)
+
+
+def sign(order_id, status_code, gross_amount, server_key):
+    """Signature notifikasi Midtrans: sha512(order_id + status_code + gross_amount + server_key)"""
+    return hashlib.sha512(f'{order_id}{status_code}{gross_amount}{server_key}'.encode()).hexdigest()
+
+
+def send_notification(odoo_url, server_key, transaction, timeout=30):
+    """Kirim notifikasi ber-signature valid ke Odoo.
+
+    Route notifikasi addon bertipe `json`, jadi payload dibungkus sebagai JSON-RPC.
+
+    :return: (http status, latency detik, body response)
+    """
+    payload = dict(transaction)
+    payload['signature_key'] = sign(
+        payload['order_id'], payload['status_code'], payload['gross_amount'], server_key
+    )
+    body = json.dumps({'jsonrpc': '2.0', 'method': 'call', 'params': payload}).encode()
+    req = urllib.request.Request(
+        odoo_url.rstrip('/') + '/payment/midtrans/notification',
+        data=body,
+        headers={'Content-Type': 'application/json'},
+    )
+    start = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        data = response.read()
+        return response.status, time.perf_counter() - start, data
+
+
+class MidtransHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'  # keep-alive, sama seperti API Midtrans
+
+    def log_message(self, format, *args):  # noqa: A002
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _simulate(self):
+        if self.server.latency:
+            time.sleep(self.server.latency * random.uniform(0.5, 1.5))
+        if self.server.error_rate and random.random() < self.server.error_rate:
+            self._reply(503, {'status_code': '503', 'status_message': 'Simulated outage'})
+            return False
+        return True
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if not self._simulate():
+            return
+        segments = self.path.strip('/').split('/')
+        if len(segments) == 3 and segments[0] == 'v2' and segments[2] == 'status':
+            tx = self.server.state.get(segments[1])
+            if not tx:
+                # Midtrans membalas HTTP 200 dengan status_code 404 di body
+                self._reply(200, {'status_code': '404', 'status_message': "Transaction doesn't exist."})
+                return
+            self._reply(200, tx)
+            return
+        self._reply(404, {'status_message': 'Not found'})
+
+    def do_POST(self):
+        if not self._simulate():
+            return
+        payload = self._read_json()
+        segments = self.path.strip('/').split('/')
+        state = self.server.state
+
+        if segments == ['v2', 'snap', 'transactions']:
+            details = payload.get('transaction_details', {})
+            state.create(details.get('order_id'), details.get('gross_amount', 0))
+            token = str(uuid.uuid4())
+            self._reply(201, {
+                'token': token,
+                'redirect_url': f'http://{self.headers.get("Host")}/snap/v2/vtweb/{token}',
+            })
+        elif segments == ['v2', 'charge']:
+            details = payload.get('transaction_details', {})
+            tx = state.create(
+                details.get('order_id'), details.get('gross_amount', 0), payload.get('payment_type')
+            )
+            tx['actions'] = [{'name': 'generate-qr-code', 'method': 'GET', 'url': 'http://localhost/qr'}]
+            tx['qr_string'] = f'00020101021226{uuid.uuid4().hex}'
+            self._reply(201, tx)
+        elif len(segments) == 3 and segments[0] == 'v2' and segments[2] in ('cancel', 'expire', 'refund'):
+            new_status = {'cancel': 'cancel', 'expire': 'expire', 'refund': 'refund'}[segments[2]]
+            tx = state.set_status(segments[1], new_status)
+            if not tx:
+                self._reply(200, {'status_code': '404', 'status_message': "Transaction doesn't exist."})
+                return
+            self._reply(200, tx)
+        else:
+            self._reply(404, {'status_message': 'Not found'})
+
+
+class MidtransSimulator(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, error_rate=0.0, verbose=False):
+        super().__init__(address, MidtransHandler)
+        self.state = MidtransState()
+        self.latency = latency
+        self.error_rate = error_rate
+        self.verbose = verbose
+
+    def start_background(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8899)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Latency rata-rata tiap response")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Rasio response 503 (0..1)")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    server = MidtransSimulator(
+        (args.host, args.port), args.latency_ms / 1000, args.error_rate, args.verbose
+    )
+    print(f'Midtrans simulator listening on http://{args.host}:{args.port}/v2')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()